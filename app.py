@@ -1,13 +1,36 @@
 import streamlit as st
 import pandas as pd
 import gspread
-from oauth2client.service_account import ServiceAccountCredentials
+import requests
+from google.auth.transport.requests import AuthorizedSession
+import openai
 from openai import OpenAI
+import hashlib
+from abc import ABC, abstractmethod
 import json
-from datetime import datetime, timedelta
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
 import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
 from google.oauth2 import service_account
+from prompts import build_action_plan_messages, build_daily_five_messages, describe_time_of_day
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+try:
+    import fcntl  # 프로세스 간 잠금 (POSIX 전용)
+except ImportError:
+    fcntl = None
+try:
+    import tiktoken  # 있으면 정확한 토큰 수, 없으면 글자 수 기반 추정
+except ImportError:
+    tiktoken = None
 
 # [기존 설정 및 스타일 유지 - 생략 없이 원본 유지]
 st.set_page_config(page_title="Dr. MBJS", layout="wide", page_icon="🧬")
@@ -174,7 +197,7 @@ def clear_old_caches(keep_days=7):
         if not os.path.exists(CACHE_DIR): return
         now = datetime.now()
         for filename in os.listdir(CACHE_DIR):
-            if filename.startswith("checkin_", "dailyfive_", "trend_") or filename.startswith("dailyfive_"):
+            if filename.startswith(("checkin_", "dailyfive_", "trend_", "flight_")):
                 filepath = os.path.join(CACHE_DIR, filename)
                 if (now - datetime.fromtimestamp(os.path.getmtime(filepath))).days > keep_days:
                     os.remove(filepath)
@@ -187,21 +210,44 @@ else:
     OPENAI_API_KEY = ""
 
 SHEET_NAME = "Projekt_MBJS_DB"
+SHEET_KEY = st.secrets["SHEET_KEY"] if "SHEET_KEY" in st.secrets else ""
+SHEETS_SCOPES = ['https://www.googleapis.com/auth/spreadsheets', 'https://www.googleapis.com/auth/drive']
+SHEETS_CONNECT_TIMEOUT = float(st.secrets["SHEETS_CONNECT_TIMEOUT"]) if "SHEETS_CONNECT_TIMEOUT" in st.secrets else 5.0
+SHEETS_READ_TIMEOUT = float(st.secrets["SHEETS_READ_TIMEOUT"]) if "SHEETS_READ_TIMEOUT" in st.secrets else 20.0
+SHEETS_POOL_SIZE = 10
+SHEETS_READS_PER_MIN = 60    # Sheets API 기본 쿼터: 사용자당 분당 읽기 60회
+SHEETS_WRITES_PER_MIN = 60   # 분당 쓰기 60회
+SHEETS_MAX_RETRIES = 5
+SHEETS_BACKOFF_BASE = 1.0    # 초
+SHEETS_BACKOFF_MAX = 32.0    # 초
+LLM_TIMEOUT = float(st.secrets["LLM_TIMEOUT"]) if "LLM_TIMEOUT" in st.secrets else 30.0   # 초: 요청 1회
+LLM_DEADLINE = 60.0          # 초: 재시도/폴백 포함 호출 전체 기본 마감
+LLM_MAX_RETRIES = 2
+LLM_BACKOFF_BASE = 1.0       # 초
+LLM_BACKOFF_MAX = 8.0        # 초
+LLM_BREAKER_THRESHOLD = 4    # 모델별 연속 실패 횟수 → 차단
+LLM_BREAKER_COOLDOWN = 60.0  # 초: 차단 유지 시간 (이후 1회 시험 호출)
+ACTION_PLAN_MODEL = st.secrets.get("ACTION_PLAN_MODEL", "gpt-4-turbo-preview")  # 프롬프트 캐싱은 gpt-4o 계열만 지원
+LLM_FALLBACK_MODELS = {"gpt-4o": "gpt-4o-mini", "gpt-4-turbo-preview": "gpt-4o-mini"} if st.secrets.get("LLM_FALLBACK", True) else {}
 CALENDAR_IDS = {
     "Sports": "nc41q7u653f9na0nt55i2a8t14@group.calendar.google.com",
-    "Termin": "u125ev7cv5du60n94crf4naqak@group.calendar.google.com"
+    "Termin": "u125ev7cv5du60n94crf4naqak@group.calendar.google.com",
+    **dict(st.secrets.get("EXTRA_CALENDAR_IDS", {})),  # 예: Work/Family/Race = "...@group.calendar.google.com"
 }
+CALENDAR_LABELS = {"Sports": "운동", "Termin": "일정"}  # 프롬프트 태그 (없으면 캘린더 이름 그대로)
 
 # ==========================================
 # 백엔드 함수
 # ==========================================
 
-def build_dailyfive_status_text(date_key, sprint_id, df_action):
+def build_dailyfive_status_text(date_key, sprint_id, data_ctx):
     """Daily Five 목록 + Action_Log 기반 완료 추정 텍스트 생성"""
     daily_five = load_dailyfive_cache(date_key, sprint_id)
     if not daily_five or 'tasks' not in daily_five:
         return "Daily Five: None"
 
+    df_action = data_ctx.action
+
     # 오늘 로그에서 DF5 수행 흔적 찾기 (최소 규칙: 'DF5:' 포함)
     today_logs = df_action[df_action['Date'] == date_key] if 'Date' in df_action.columns else df_action
     inputs = " ".join([str(x) for x in today_logs.get('User_Input', []).tolist()]) if not today_logs.empty else ""
@@ -228,44 +274,1223 @@ def build_dailyfive_status_text(date_key, sprint_id, df_action):
     return "\n".join(lines)
 
 
+KST = timezone(timedelta(hours=9))
+
 def get_current_kst():
     sys_now = datetime.now()
     if abs((sys_now - datetime.utcnow()).total_seconds()) < 300:
         return sys_now + timedelta(hours=9)
     return sys_now
 
-def normalize_context_for_cache(context_str):
-    import re
-    normalized = re.sub(r'\(\d{2}:\d{2}\)', '(TIME)', context_str)
-    normalized = re.sub(r'- \d{2}:\d{2}', '- TIME', normalized)
-    return normalized
-    
 def get_mission_date_key():
     now_kst = get_current_kst()
     if now_kst.hour < 5: 
         return (now_kst - timedelta(days=1)).strftime('%Y-%m-%d')
     return now_kst.strftime('%Y-%m-%d')
 
+# ==========================================
+# [Sheets 요청 스케줄러] 모든 읽기/쓰기는 sheets_call()을 통과
+# - 분당 토큰 버킷 (쿼터와 동일), 읽기는 429/5xx를 지수 백오프 + 지터로 재시도, 쓰기는 429만 재시도
+# - 같은 키의 읽기가 이미 진행 중이면 새로 호출하지 않고 결과를 공유
+# ==========================================
+class TokenBucket:
+    """분당 per_minute회 요청 허용. acquire()는 토큰이 생길 때까지 대기하고 대기 시간(초)을 반환"""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+def _http_status(e):
+    """gspread APIError / requests 예외에서 HTTP 상태 코드 추출"""
+    response = getattr(e, "response", None)
+    return getattr(response, "status_code", None)
+
+class SheetsScheduler:
+    """프로세스 전역 Sheets 요청 스케줄러"""
+
+    RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(self):
+        self.buckets = {"read": TokenBucket(SHEETS_READS_PER_MIN), "write": TokenBucket(SHEETS_WRITES_PER_MIN)}
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.stats = {
+            "requests": 0, "throttled": 0, "rate_limited": 0, "retries": 0,
+            "coalesced": 0, "errors": 0, "last_error": "", "last_error_at": 0.0,
+        }
+
+    def _bump(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def call(self, kind, fn, *args, coalesce_key=None, **kwargs):
+        if kind != "read" or coalesce_key is None:
+            return self._execute(kind, fn, args, kwargs)
+
+        with self.lock:
+            entry = self.inflight.get(coalesce_key)
+            leader = entry is None
+            if leader:
+                entry = {"event": threading.Event(), "result": None, "error": None}
+                self.inflight[coalesce_key] = entry
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            entry["event"].wait()
+            if entry["error"] is not None:
+                raise entry["error"]
+            return entry["result"]
+
+        try:
+            entry["result"] = self._execute(kind, fn, args, kwargs)
+            return entry["result"]
+        except Exception as e:
+            entry["error"] = e
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(coalesce_key, None)
+            entry["event"].set()
+
+    def _execute(self, kind, fn, args, kwargs):
+        for attempt in range(SHEETS_MAX_RETRIES + 1):
+            if self.buckets[kind].acquire() > 0:
+                self._bump("throttled")
+            self._bump("requests")
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                status = _http_status(e)
+                if status == 429:
+                    self._bump("rate_limited")
+                if kind == "write":
+                    # 타임아웃/5xx는 서버에 이미 반영됐는지 알 수 없어 여기서 재시도하면 행이 중복될 수 있다.
+                    # 요청이 거절된 게 확실한 429만 재시도하고, 나머지는 호출자가 판단 (저널은 'unknown' 후 대조)
+                    retryable = status == 429
+                else:
+                    retryable = status in self.RETRYABLE_STATUS or isinstance(
+                        e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+                    )
+                if not retryable or attempt == SHEETS_MAX_RETRIES:
+                    with self.lock:
+                        self.stats["errors"] += 1
+                        self.stats["last_error"] = f"{type(e).__name__}: {e}"[:300]
+                        self.stats["last_error_at"] = time.time()
+                    raise
+                self._bump("retries")
+                # full jitter: 0 ~ min(max, base * 2^attempt)
+                time.sleep(random.uniform(0, min(SHEETS_BACKOFF_MAX, SHEETS_BACKOFF_BASE * (2 ** attempt))))
+
 @st.cache_resource
-def get_db_connection(worksheet_name):
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+def get_sheets_scheduler():
+    return SheetsScheduler()
+
+def sheets_call(kind, fn, *args, coalesce_key=None, **kwargs):
+    """kind: "read" / "write" """
+    return get_sheets_scheduler().call(kind, fn, *args, coalesce_key=coalesce_key, **kwargs)
+
+def sheets_recently_failed(window_sec=300):
+    """최근 window_sec 안에 재시도까지 실패한 Sheets 요청이 있는지"""
+    stats = get_sheets_scheduler().stats
+    return stats["last_error_at"] > 0 and time.time() - stats["last_error_at"] < window_sec
+
+def load_google_credentials(scopes):
+    """서비스 계정 자격증명 (st.secrets 우선, 없으면 service_account.json)"""
     if "gcp_service_account" in st.secrets:
-        creds = ServiceAccountCredentials.from_json_keyfile_dict(st.secrets["gcp_service_account"], scope)
-    else:
-        creds = ServiceAccountCredentials.from_json_keyfile_name('service_account.json', scope)
-    return gspread.authorize(creds).open(SHEET_NAME).worksheet(worksheet_name)
+        return service_account.Credentials.from_service_account_info(dict(st.secrets["gcp_service_account"]), scopes=scopes)
+    return service_account.Credentials.from_service_account_file('service_account.json', scopes=scopes)
 
-# [핵심 추가] API 호출 방어용 캐싱 함수 (15분간 데이터 저장)
-@st.cache_data(ttl=900)
-def fetch_sheet_data(worksheet_name):
+@st.cache_resource
+def get_sheets_client():
+    """
+    프로세스 전체에서 공유하는 gspread 클라이언트 (1회 인증).
+    - AuthorizedSession: keep-alive 커넥션 풀 + 토큰 만료 시 자동 갱신
+    - 타임아웃: (connect, read) 초
+    """
+    creds = load_google_credentials(SHEETS_SCOPES)
+    session = AuthorizedSession(creds)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=SHEETS_POOL_SIZE, pool_maxsize=SHEETS_POOL_SIZE)
+    session.mount("https://", adapter)
+    client = gspread.Client(auth=creds, session=session)
+    client.set_timeout((SHEETS_CONNECT_TIMEOUT, SHEETS_READ_TIMEOUT))
+    return client
+
+@st.cache_resource
+def get_spreadsheet():
+    """스프레드시트 핸들 (SHEET_KEY로 열기. 키가 없을 때만 제목 검색 = Drive 검색 1회)"""
+    client = get_sheets_client()
+    if SHEET_KEY:
+        return sheets_call("read", client.open_by_key, SHEET_KEY)
+    spreadsheet = sheets_call("read", client.open, SHEET_NAME)
+    print(f"ℹ️ SHEET_KEY 미설정: '{SHEET_NAME}' 제목 검색으로 열었습니다. secrets에 SHEET_KEY = \"{spreadsheet.id}\" 를 추가하세요.")
+    return spreadsheet
+
+@st.cache_resource
+def get_worksheet_handles():
+    """메타데이터 1회 조회로 모든 워크시트 핸들 생성 {title: Worksheet}"""
+    return {ws.title: ws for ws in sheets_call("read", get_spreadsheet().worksheets)}
+
+@st.cache_resource
+def get_db_connection(worksheet_name):
+    handles = get_worksheet_handles()
+    if worksheet_name in handles:
+        return handles[worksheet_name]
+    return sheets_call("read", get_spreadsheet().worksheet, worksheet_name)
+
+# ==========================================
+# [저장소 백엔드] 앱이 실제로 쓰는 연산만 정의
+# - read_many: 워크시트 전체(헤더 포함) 또는 N행 이후 행들을 한 번에 읽기
+# - read_values / append_rows / update_cells
+# - "sheets": Google Sheets (스케줄러 경유), "sqlite": 로컬 인덱스 SQLite (오프라인/벤치마크용)
+# ==========================================
+STORAGE_BACKEND = st.secrets["STORAGE_BACKEND"] if "STORAGE_BACKEND" in st.secrets else "sheets"
+STORAGE_SQLITE_PATH = st.secrets["STORAGE_SQLITE_PATH"] if "STORAGE_SQLITE_PATH" in st.secrets else os.path.join(CACHE_DIR, "mbjs_data.db")
+
+# SQLite 백엔드가 비어 있을 때 쓰는 헤더 (시트 구조와 동일)
+DEFAULT_SHEET_HEADERS = {
+    "Health_Log": ["Date", "HRV", "RHR", "Weight", "Sleep_duration"],
+    "Action_Log": ["Date", "Action_Time", "Category", "User_Input", "AI_Analysis_JSON", "Memo"],
+    "Missions": ["Mission_ID", "Name", "Status", "Start_Date", "End_Date", "Start_Wt", "Target_Wt", "Daily_Cal"],
+    "Mission_Rules": ["Mission_ID", "Rule_Type", "Rule_Value"],
+    "Sprints": ["Sprint_ID", "Name", "Status", "Start_Date", "End_Date", "Duration_Days", "Description"],
+    "Sprint_Goals": ["Goal_ID", "Sprint_ID", "Metric_Type", "Start_Value", "Target_Value", "Unit", "Priority"],
+}
+
+def _parse_start_row(updated_range):
+    """'Action_Log'!A120:F121 → 120"""
+    m = re.search(r"![A-Z]+(\d+)", updated_range or "")
+    return int(m.group(1)) if m else None
+
+class StorageBackend(ABC):
+    """
+    저장소 인터페이스. 행 번호는 시트와 같은 규칙(1행=헤더, 데이터는 2행부터)을 따른다.
+    read_many 요청: (worksheet, since, n_cols)
+    - since=None: 헤더 포함 전체 값
+    - since=N: 앞의 데이터 N행 이후의 행들 (n_cols 컬럼까지)
+    """
+    name = "base"
+
+    @abstractmethod
+    def read_many(self, requests):
+        ...
+
+    @abstractmethod
+    def append_rows(self, worksheet_name, rows):
+        """행 추가. 첫 번째로 추가된 행 번호 반환 (모르면 None)"""
+
+    @abstractmethod
+    def update_cells(self, worksheet_name, updates):
+        """updates: [(row, col, value)] (1-based)"""
+
+    def read_values(self, worksheet_name):
+        return self.read_many([(worksheet_name, None, None)])[0]
+
+class GoogleSheetsBackend(StorageBackend):
+    """Google Sheets. 여러 범위 읽기는 values.batchGet 1회, 모든 호출은 sheets_call 스케줄러 경유"""
+    name = "sheets"
+
+    @staticmethod
+    def _range(worksheet_name, since, n_cols):
+        if since is None:
+            return f"'{worksheet_name}'"
+        last_col = re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, max(1, n_cols or 1)))
+        return f"'{worksheet_name}'!A{since + 2}:{last_col}"
+
+    def read_many(self, requests):
+        ranges = [self._range(*r) for r in requests]
+        res = sheets_call("read", get_spreadsheet().values_batch_get, ranges, coalesce_key=("batch", tuple(ranges)))
+        value_ranges = res.get("valueRanges", [])
+        return [vr.get("values", []) for vr in value_ranges] + [[]] * (len(ranges) - len(value_ranges))
+
+    def append_rows(self, worksheet_name, rows):
+        res = sheets_call("write", get_db_connection(worksheet_name).append_rows, rows)
+        return _parse_start_row((res or {}).get("updates", {}).get("updatedRange"))
+
+    def update_cells(self, worksheet_name, updates):
+        sheets_call("write", get_db_connection(worksheet_name).batch_update, [
+            {"range": gspread.utils.rowcol_to_a1(row, col), "values": [[value]]} for row, col, value in updates
+        ])
+
+class SQLiteBackend(StorageBackend):
+    """로컬 SQLite. (worksheet, row_idx) 기본키 (읽기는 전체 또는 N행 이후뿐이라 다른 인덱스는 두지 않음)"""
+    name = "sqlite"
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS sheet_headers (
+                    worksheet TEXT PRIMARY KEY,
+                    header_json TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS sheet_rows (
+                    worksheet TEXT NOT NULL,
+                    row_idx INTEGER NOT NULL,
+                    row_json TEXT NOT NULL,
+                    PRIMARY KEY (worksheet, row_idx)
+                );
+                DROP INDEX IF EXISTS idx_sheet_rows_date;
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _conn(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _header(self, conn, worksheet_name):
+        row = conn.execute("SELECT header_json FROM sheet_headers WHERE worksheet = ?", (worksheet_name,)).fetchone()
+        return json.loads(row[0]) if row else list(DEFAULT_SHEET_HEADERS.get(worksheet_name, []))
+
+    def read_many(self, requests):
+        conn = self._conn()
+        try:
+            out = []
+            for worksheet_name, since, n_cols in requests:
+                header = self._header(conn, worksheet_name)
+                rows = [json.loads(r[0]) for r in conn.execute(
+                    "SELECT row_json FROM sheet_rows WHERE worksheet = ? AND row_idx >= ? ORDER BY row_idx",
+                    (worksheet_name, since or 0)
+                )]
+                if since is None:
+                    out.append([header] + rows if header else [])
+                else:
+                    out.append([r[:n_cols] if n_cols else r for r in rows])
+            return out
+        finally:
+            conn.close()
+
+    def append_rows(self, worksheet_name, rows):
+        with self.lock:
+            conn = self._conn()
+            try:
+                next_idx = conn.execute(
+                    "SELECT COALESCE(MAX(row_idx) + 1, 0) FROM sheet_rows WHERE worksheet = ?", (worksheet_name,)
+                ).fetchone()[0]
+                conn.executemany(
+                    "INSERT INTO sheet_rows (worksheet, row_idx, row_json) VALUES (?, ?, ?)",
+                    [(worksheet_name, next_idx + i, json.dumps(list(r), ensure_ascii=False))
+                     for i, r in enumerate(rows)]
+                )
+                conn.commit()
+                return next_idx + 2
+            finally:
+                conn.close()
+
+    def update_cells(self, worksheet_name, updates):
+        with self.lock:
+            conn = self._conn()
+            try:
+                for row, col, value in updates:
+                    found = conn.execute(
+                        "SELECT row_json FROM sheet_rows WHERE worksheet = ? AND row_idx = ?", (worksheet_name, row - 2)
+                    ).fetchone()
+                    if not found:
+                        continue
+                    values = json.loads(found[0])
+                    values += [""] * max(0, col - len(values))
+                    values[col - 1] = value
+                    conn.execute(
+                        "UPDATE sheet_rows SET row_json = ? WHERE worksheet = ? AND row_idx = ?",
+                        (json.dumps(values, ensure_ascii=False), worksheet_name, row - 2)
+                    )
+                conn.commit()
+            finally:
+                conn.close()
+
+    def import_values(self, worksheet_name, values):
+        """워크시트 전체 교체 (헤더 포함 값 리스트). Sheets → SQLite 복사용"""
+        header = values[0] if values else list(DEFAULT_SHEET_HEADERS.get(worksheet_name, []))
+        with self.lock:
+            conn = self._conn()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sheet_headers (worksheet, header_json) VALUES (?, ?)",
+                    (worksheet_name, json.dumps(header, ensure_ascii=False))
+                )
+                conn.execute("DELETE FROM sheet_rows WHERE worksheet = ?", (worksheet_name,))
+                conn.executemany(
+                    "INSERT INTO sheet_rows (worksheet, row_idx, row_json) VALUES (?, ?, ?)",
+                    [(worksheet_name, i, json.dumps(list(r), ensure_ascii=False))
+                     for i, r in enumerate(values[1:])]
+                )
+                conn.commit()
+            finally:
+                conn.close()
+
+@st.cache_resource
+def get_storage():
+    """설정된 저장소 백엔드 (프로세스당 1개)"""
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteBackend(STORAGE_SQLITE_PATH)
+    return GoogleSheetsBackend()
+
+def copy_sheets_to_sqlite():
+    """Google Sheets 전체를 SQLite 백엔드로 복사 (batchGet 1회). 복사한 워크시트 수 반환"""
+    names = list(BULK_WORKSHEETS) + list(MIRRORED_WORKSHEETS)
+    values_list = GoogleSheetsBackend().read_many([(name, None, None) for name in names])
+    target = SQLiteBackend(STORAGE_SQLITE_PATH)
+    for name, values in zip(names, values_list):
+        target.import_values(name, values)
+    return len(names)
+
+# [핵심 추가] API 호출 방어용 캐싱 (15분간 데이터 저장)
+# - 설정 시트(Missions 등)는 스냅샷 캐시, 로그 시트는 로컬 미러
+# - 콜드 스타트 시 bulk_load_sheets()가 values.batchGet 1회로 모든 캐시를 채운다
+SHEET_CACHE_TTL = 900
+# "swr": 만료돼도 마지막 스냅샷을 즉시 반환하고 백그라운드에서 갱신 (스냅샷이 있으면 네트워크 대기 없음)
+# "blocking": 만료 시 렌더 안에서 바로 재조회
+SHEET_CACHE_MODE = st.secrets["SHEET_CACHE_MODE"] if "SHEET_CACHE_MODE" in st.secrets else "swr"
+BULK_WORKSHEETS = ("Missions", "Mission_Rules", "Sprints", "Sprint_Goals")
+
+@st.cache_resource
+def get_sheet_snapshots():
+    """프로세스 전역 설정 시트 스냅샷 {worksheet: {"records": [...], "fetched_at": ts}}"""
+    return {"lock": threading.Lock(), "data": {}}
+
+def snapshot_is_fresh(worksheet_name):
+    snap = get_sheet_snapshots()["data"].get(worksheet_name)
+    return bool(snap) and time.time() - snap["fetched_at"] < SHEET_CACHE_TTL
+
+def get_sheet_snapshot(worksheet_name):
+    """스냅샷 records 반환. 만료 시 swr 모드면 마지막 스냅샷 + 백그라운드 갱신, blocking 모드면 None"""
+    snap = get_sheet_snapshots()["data"].get(worksheet_name)
+    if not snap:
+        return None
+    if not snapshot_is_fresh(worksheet_name):
+        if SHEET_CACHE_MODE != "swr":
+            return None
+        refresh_sheets_in_background()
+    return snap["records"]
+
+def store_sheet_snapshot(worksheet_name, records):
+    """스냅샷 저장. 내용이 바뀌었으면 태그 버전을 올려 이전 버전으로 캐시된 st.cache_data 항목을 버린다"""
+    data = get_sheet_snapshots()["data"]
+    previous = data.get(worksheet_name)
+    data[worksheet_name] = {"records": records, "fetched_at": time.time()}
+    if previous is None or previous["records"] != records:
+        bump_tag_versions(worksheet_name)
+
+# [태그 기반 캐시 무효화]
+# st.cache_data 함수는 의존하는 워크시트 태그의 버전(cache_version)을 인자로 받는다.
+# invalidate_tags("Action_Log")는 해당 태그 버전만 올리므로, Action_Log에 의존하는 항목만 다시 계산되고
+# Missions/Sprints 데이터나 이미 생성된 체크인/Daily Five(LLM 결과)는 그대로 유지된다.
+# 설정 시트 태그는 새 스냅샷이 이전과 다른 내용으로 저장될 때(store_sheet_snapshot, swr 갱신 포함) 올라간다.
+@st.cache_resource
+def get_cache_tags():
+    return {"lock": threading.Lock(), "versions": {}}
+
+def cache_version(*tags):
+    versions = get_cache_tags()["versions"]
+    return tuple(versions.get(t, 0) for t in tags)
+
+def bump_tag_versions(*tags):
+    state = get_cache_tags()
+    with state["lock"]:
+        for t in tags:
+            state["versions"][t] = state["versions"].get(t, 0) + 1
+
+def invalidate_tags(*tags):
+    bump_tag_versions(*tags)
+    for t in tags:
+        snap = get_sheet_snapshots()["data"].get(t)
+        if snap:
+            snap["fetched_at"] = 0  # 설정 시트 스냅샷은 만료 처리 → swr 갱신
+
+def _fetch_sheet_records(worksheet_name):
     """시트 데이터를 안전하게 가져오고, 에러 발생 시 빈 리스트를 반환하여 앱 멈춤 방지"""
     try:
-        sheet = get_db_connection(worksheet_name)
-        return sheet.get_all_records()
+        values = get_storage().read_values(worksheet_name)
+        records = values_to_records(values[0], values[1:]) if values else []
+        store_sheet_snapshot(worksheet_name, records)
+        return records
     except Exception as e:
         print(f"⚠️ API Error ({worksheet_name}): {e}")
         return []
 
+def fetch_sheet_data(worksheet_name):
+    """로그 시트는 로컬 미러에서, 나머지 설정 시트는 15분 스냅샷에서 records 반환"""
+    if worksheet_name in MIRRORED_WORKSHEETS:
+        return load_sheet_frame(worksheet_name).to_dict("records")
+
+    records = get_sheet_snapshot(worksheet_name)
+    if records is None and worksheet_name in BULK_WORKSHEETS:
+        bulk_load_sheets()
+        records = get_sheet_snapshot(worksheet_name)
+    if records is None:
+        # batchGet 실패 또는 bulk 대상이 아닌 시트 → 개별 조회
+        records = _fetch_sheet_records(worksheet_name)
+    return records
+
+def bulk_load_sheets(force=False):
+    """
+    만료된 설정 시트 전체 범위 + 동기화가 필요한 로그 시트 델타 범위를
+    values.batchGet 한 번으로 받아 스냅샷/미러를 채운다. 조회한 범위 수 반환
+    """
+    snapshots = get_sheet_snapshots()
+    mirror_locks = get_mirror_state()["locks"]
+    with snapshots["lock"]:
+        for name in MIRRORED_WORKSHEETS:
+            mirror_locks[name].acquire()
+        conn = open_local_db()
+        try:
+            targets = []  # (worksheet, read 요청, mirror_plan or None)
+            for name in BULK_WORKSHEETS:
+                if force or not snapshot_is_fresh(name):
+                    targets.append((name, (name, None, None), None))
+            for name in MIRRORED_WORKSHEETS:
+                plan = plan_mirror_sync(conn, name, force)
+                if plan:
+                    targets.append((name, plan["request"], plan))
+            if not targets:
+                return 0
+
+            values_list = get_storage().read_many([t[1] for t in targets])
+            for (name, _, plan), values in zip(targets, values_list):
+                if plan:
+                    apply_mirror_sync(conn, name, plan, values)
+                else:
+                    header = values[0] if values else []
+                    store_sheet_snapshot(name, values_to_records(header, values[1:]))
+            conn.commit()
+            return len(targets)
+        except Exception as e:
+            print(f"⚠️ Bulk load error: {e}")
+            return 0
+        finally:
+            conn.close()
+            for name in reversed(MIRRORED_WORKSHEETS):
+                mirror_locks[name].release()
+
+@st.cache_resource
+def get_refresh_state():
+    """백그라운드 갱신 스레드 상태 (동시에 1개만 실행)"""
+    return {"lock": threading.Lock(), "running": False, "last_finished": 0.0}
+
+def refresh_sheets_in_background():
+    """bulk_load_sheets()를 백그라운드 스레드에서 실행. 이미 실행 중이면 아무것도 안 함"""
+    state = get_refresh_state()
+    with state["lock"]:
+        if state["running"]:
+            return False
+        state["running"] = True
+
+    def _run():
+        try:
+            bulk_load_sheets()
+        finally:
+            with state["lock"]:
+                state["running"] = False
+                state["last_finished"] = time.time()
+
+    threading.Thread(target=_run, name="sheets-swr-refresh", daemon=True).start()
+    return True
+
+def prefetch_sheets():
+    """
+    rerun 시작 시 호출.
+    - 비어 있는 캐시가 있으면(콜드 스타트) batchGet 1회로 블로킹 로딩
+    - 만료만 됐으면 swr 모드에서는 백그라운드 갱신만 걸고 바로 반환
+    """
+    snapshots = get_sheet_snapshots()["data"]
+    conn = open_local_db()
+    try:
+        mirror = {name: mirror_status(conn, name) for name in MIRRORED_WORKSHEETS}
+    finally:
+        conn.close()
+
+    cold = any(name not in snapshots for name in BULK_WORKSHEETS) or any(v == "missing" for v in mirror.values())
+    due = any(not snapshot_is_fresh(name) for name in BULK_WORKSHEETS) or any(v == "stale" for v in mirror.values())
+    if cold or (due and SHEET_CACHE_MODE != "swr"):
+        bulk_load_sheets()
+    elif due:
+        refresh_sheets_in_background()
+
+def get_snapshot_age(worksheet_name):
+    """마지막으로 시트와 동기화된 뒤 지난 시간(초). 모르면 None"""
+    if worksheet_name in MIRRORED_WORKSHEETS:
+        conn = open_local_db()
+        try:
+            meta = conn.execute("SELECT synced_at FROM mirror_meta WHERE worksheet = ?", (worksheet_name,)).fetchone()
+        finally:
+            conn.close()
+        synced_at = meta[0] if meta and meta[0] > 0 else None
+    else:
+        snap = get_sheet_snapshots()["data"].get(worksheet_name)
+        synced_at = snap["fetched_at"] if snap else None
+    return time.time() - synced_at if synced_at else None
+
+def format_age(seconds):
+    if seconds is None:
+        return "알 수 없음"
+    if seconds < 60:
+        return "방금"
+    if seconds < 3600:
+        return f"{int(seconds // 60)}분 전"
+    return f"{int(seconds // 3600)}시간 전"
+
+# ==========================================
+# [로컬 미러] Health_Log / Action_Log 증분 동기화
+# - 시트 전체를 매번 받지 않고, 마지막으로 알려진 행 이후에 추가된 행만 가져온다
+# - 미러는 SQLite (행 원본 값 그대로 저장), DataFrame은 행 수 기준으로 메모리 재사용
+# ==========================================
+LOCAL_DB_PATH = os.path.join(CACHE_DIR, "mbjs_local.db")
+MIRRORED_WORKSHEETS = ("Health_Log", "Action_Log")  # append-only 로그 시트만 미러링
+MIRROR_SYNC_INTERVAL = 60        # 초: 이 간격 안에서는 델타 조회 없이 미러만 사용
+MIRROR_FULL_RESYNC = 3600 * 24   # 초: 시트에서 행 삭제/수정된 경우를 대비한 주기적 전체 재동기화
+
+@st.cache_resource
+def init_local_db():
+    """로컬 SQLite 스키마 생성/마이그레이션 (프로세스당 1회)"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    conn = sqlite3.connect(LOCAL_DB_PATH, timeout=30)
+    try:
+        _create_local_schema(conn)
+        conn.commit()
+    finally:
+        conn.close()
+    return True
+
+def open_local_db():
+    """로컬 SQLite 연결 (스키마는 init_local_db에서 1번만 생성)"""
+    init_local_db()
+    return sqlite3.connect(LOCAL_DB_PATH, timeout=30)
+
+def _create_local_schema(conn):
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS mirror_meta (
+            worksheet TEXT PRIMARY KEY,
+            header_json TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            synced_at REAL NOT NULL,
+            full_synced_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS mirror_rows (
+            worksheet TEXT NOT NULL,
+            row_idx INTEGER NOT NULL,
+            row_json TEXT NOT NULL,
+            PRIMARY KEY (worksheet, row_idx)
+        );
+        CREATE TABLE IF NOT EXISTS action_journal (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            row_json TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at REAL NOT NULL,
+            flushed_at REAL,
+            sheet_row INTEGER,
+            last_error TEXT,
+            parse_status TEXT NOT NULL DEFAULT 'done',
+            ai_synced INTEGER NOT NULL DEFAULT 1,
+            claimed_at REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_action_journal_status ON action_journal (status, id);
+        CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            response_text TEXT NOT NULL,
+            prompt_tokens INTEGER NOT NULL DEFAULT 0,
+            completion_tokens INTEGER NOT NULL DEFAULT 0,
+            size_bytes INTEGER NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            last_access REAL NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache (last_access);
+        CREATE TABLE IF NOT EXISTS plan_state (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date_key TEXT NOT NULL,
+            fingerprint_json TEXT NOT NULL,
+            result_json TEXT NOT NULL,
+            reasons_json TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_plan_state_date ON plan_state (date_key, id);
+        CREATE TABLE IF NOT EXISTS food_index (
+            name_key TEXT PRIMARY KEY,
+            food_name TEXT NOT NULL,
+            calories REAL NOT NULL,
+            macros TEXT NOT NULL DEFAULT '',
+            summary TEXT NOT NULL DEFAULT '',
+            source TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """)
+    _ensure_columns(conn, "action_journal", {
+        "parse_status": "TEXT NOT NULL DEFAULT 'done'",
+        "ai_synced": "INTEGER NOT NULL DEFAULT 1",
+        "claimed_at": "REAL",
+    })
+
+def _ensure_columns(conn, table, columns):
+    """이전 버전에서 만든 테이블에 빠진 컬럼 추가"""
+    existing = {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+    for name, ddl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}")
+
+@st.cache_resource
+def get_mirror_state():
+    """프로세스 전역 미러 상태 (워크시트별 락 + DataFrame 메모리 캐시)"""
+    return {"locks": {name: threading.Lock() for name in MIRRORED_WORKSHEETS}, "frames": {}}
+
+def values_to_records(header, rows):
+    """get_all_values 형태의 행 리스트를 get_all_records와 같은 dict 리스트로 변환"""
+    records = []
+    for row in rows:
+        padded = (list(row) + [""] * len(header))[:len(header)]
+        records.append(dict(zip(header, gspread.utils.numericise_all(padded))))
+    return records
+
+def mirror_status(conn, worksheet_name):
+    """missing(미러 없음) / stale(간격 경과) / fresh"""
+    meta = conn.execute("SELECT synced_at FROM mirror_meta WHERE worksheet = ?", (worksheet_name,)).fetchone()
+    if not meta:
+        return "missing"
+    if time.time() - meta[0] >= MIRROR_SYNC_INTERVAL:
+        return "stale"
+    return "fresh"
+
+def plan_mirror_sync(conn, worksheet_name, force=False):
+    """이번에 조회할 범위 결정. 동기화가 필요 없으면 None"""
+    meta = conn.execute(
+        "SELECT header_json, row_count, synced_at, full_synced_at FROM mirror_meta WHERE worksheet = ?",
+        (worksheet_name,)
+    ).fetchone()
+    now = time.time()
+    if meta and not force and mirror_status(conn, worksheet_name) == "fresh":
+        return None
+
+    if not meta or now - meta[3] > MIRROR_FULL_RESYNC:
+        # 최초 또는 주기적 전체 동기화 (헤더 포함 시트 전체)
+        return {"full": True, "request": (worksheet_name, None, None), "start_idx": 0, "header": None, "full_synced_at": now}
+
+    # 델타 동기화: 헤더(1행) + 기존 row_count 행 이후 범위만 조회
+    header, start_idx = json.loads(meta[0]), meta[1]
+    return {
+        "full": False, "request": (worksheet_name, start_idx, len(header)),
+        "start_idx": start_idx, "header": header, "full_synced_at": meta[3],
+    }
+
+def apply_mirror_sync(conn, worksheet_name, plan, values):
+    """조회 결과를 미러에 반영 (commit은 호출자). 새로 추가된 행 수 반환"""
+    if plan["full"]:
+        header, new_rows = (values[0] if values else []), values[1:]
+        conn.execute("DELETE FROM mirror_rows WHERE worksheet = ?", (worksheet_name,))
+    else:
+        header, new_rows = plan["header"], values
+
+    start_idx = plan["start_idx"]
+    conn.executemany(
+        "INSERT OR REPLACE INTO mirror_rows (worksheet, row_idx, row_json) VALUES (?, ?, ?)",
+        [(worksheet_name, start_idx + i, json.dumps(list(r), ensure_ascii=False)) for i, r in enumerate(new_rows)]
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO mirror_meta (worksheet, header_json, row_count, synced_at, full_synced_at) VALUES (?, ?, ?, ?, ?)",
+        (worksheet_name, json.dumps(header, ensure_ascii=False), start_idx + len(new_rows), time.time(), plan["full_synced_at"])
+    )
+    return len(new_rows)
+
+def sync_worksheet_mirror(worksheet_name, force=False):
+    """마지막으로 알려진 행 수 이후에 추가된 행만 받아 미러에 저장. 새로 추가된 행 수 반환"""
+    state = get_mirror_state()
+    with state["locks"][worksheet_name]:
+        conn = open_local_db()
+        try:
+            plan = plan_mirror_sync(conn, worksheet_name, force)
+            if not plan:
+                return 0
+            values = get_storage().read_many([plan["request"]])[0]
+            added = apply_mirror_sync(conn, worksheet_name, plan, values)
+            conn.commit()
+            return added
+        except Exception as e:
+            print(f"⚠️ Mirror sync error ({worksheet_name}): {e}")
+            return 0
+        finally:
+            conn.close()
+
+def reset_mirror(worksheet_name=None):
+    """미러 삭제 (다음 로딩 때 전체 재동기화)"""
+    conn = open_local_db()
+    try:
+        for name in ([worksheet_name] if worksheet_name else MIRRORED_WORKSHEETS):
+            conn.execute("DELETE FROM mirror_meta WHERE worksheet = ?", (name,))
+            conn.execute("DELETE FROM mirror_rows WHERE worksheet = ?", (name,))
+            get_mirror_state()["frames"].pop(name, None)
+        conn.commit()
+    finally:
+        conn.close()
+
+def load_sheet_frame(worksheet_name):
+    """미러 기반 DataFrame 반환 (필요 시 델타 동기화 후). 행 수가 같으면 메모리 캐시 재사용"""
+    conn = open_local_db()
+    try:
+        status = mirror_status(conn, worksheet_name)
+    finally:
+        conn.close()
+    if status == "stale" and SHEET_CACHE_MODE == "swr":
+        refresh_sheets_in_background()
+    elif status != "fresh":
+        sync_worksheet_mirror(worksheet_name)
+
+    state = get_mirror_state()
+    conn = open_local_db()
+    try:
+        meta = conn.execute(
+            "SELECT header_json, row_count FROM mirror_meta WHERE worksheet = ?", (worksheet_name,)
+        ).fetchone()
+        if not meta:
+            return pd.DataFrame()
+        header, row_count = json.loads(meta[0]), meta[1]
+
+        cached = state["frames"].get(worksheet_name)
+        if cached and cached[0] == row_count and list(cached[1].columns) == header:
+            return cached[1].copy()
+
+        rows = [json.loads(r[0]) for r in conn.execute(
+            "SELECT row_json FROM mirror_rows WHERE worksheet = ? ORDER BY row_idx", (worksheet_name,)
+        )]
+    finally:
+        conn.close()
+
+    df = pd.DataFrame(values_to_records(header, rows), columns=header)
+    state["frames"][worksheet_name] = (row_count, df)
+    return df.copy()
+
+# ==========================================
+# [쓰기 저널] Action_Log 추가는 로컬 저널에 먼저 기록 → 백그라운드에서 일괄 append_rows
+# - 제출은 로컬 SQLite INSERT만 하고 즉시 반환 (Sheets가 느리거나 죽어도 유실 없음)
+# - 시트에 반영되기 전까지는 DataContext가 미러 위에 저널 행을 덧붙여 보여준다
+# - status: pending(대기) / sending(전송 중) / unknown(결과 불명) / flushed(반영됨)
+#   전송이 타임아웃/5xx로 끝나면 시트에 이미 들어갔을 수 있어 바로 다시 보내지 않고,
+#   다음 회차에 미러와 대조해 있으면 flushed, 없으면 pending으로 (4xx는 거절이 확실하므로 바로 pending)
+# ==========================================
+JOURNAL_BATCH_WINDOW = 1.0     # 초: 깨어난 뒤 같이 보낼 행을 모으는 시간
+JOURNAL_BATCH_SIZE = 50
+JOURNAL_RETRY_BASE = 5.0       # 초: 전송 실패 시 대기 (실패할수록 2배, 최대 5분)
+JOURNAL_KEEP_DAYS = 7
+JOURNAL_CLAIM_TIMEOUT = 600    # 초: 'sending'으로 이보다 오래 남은 행(전송 중 프로세스 종료)은 'unknown'으로
+JOURNAL_MATCH_COLUMNS = ("Date", "Action_Time", "Category", "User_Input")  # 'unknown' 행을 시트 행과 대조할 키
+
+def journal_append(rows, parse_pending=False):
+    """
+    Action_Log에 쓸 행들을 저널에 기록하고 flusher를 깨운다. 저널 id 리스트 반환
+    parse_pending=True: AI_Analysis_JSON을 비운 채로 먼저 전송하고, 파싱은 백그라운드 워커가 채움
+    (행마다 다르면 rows와 같은 길이의 bool 리스트)
+    """
+    flags = list(parse_pending) if isinstance(parse_pending, (list, tuple)) else [parse_pending] * len(rows)
+    conn = open_local_db()
+    try:
+        now = time.time()
+        ids = []
+        for row, pending in zip(rows, flags):
+            cur = conn.execute(
+                "INSERT INTO action_journal (row_json, status, created_at, parse_status) VALUES (?, 'pending', ?, ?)",
+                (json.dumps(list(row), ensure_ascii=False), now, "pending" if pending else "done")
+            )
+            ids.append(cur.lastrowid)
+        conn.commit()
+    finally:
+        conn.close()
+    get_journal_flusher()["wake"].set()
+    if any(flags):
+        get_parse_worker()["wake"].set()
+    return ids
+
+def claim_journal_rows(conn):
+    """
+    대기 행을 'sending'으로 바꾸면서 가져온다 (UPDATE ... RETURNING 1문장 = 원자적).
+    flusher가 둘 이상 돌아도 같은 행을 두 번 append하지 않는다. [(id, row_json)] id 순
+    """
+    now = time.time()
+    claimed = conn.execute(
+        "UPDATE action_journal SET status = 'sending', claimed_at = ? "
+        "WHERE id IN (SELECT id FROM action_journal WHERE status = 'pending' ORDER BY id LIMIT ?) "
+        "RETURNING id, row_json",
+        (now, JOURNAL_BATCH_SIZE)
+    ).fetchall()
+    conn.commit()
+    return sorted(claimed)
+
+def reconcile_journal_rows(conn):
+    """
+    전송 결과가 불명인 행('unknown', 오래된 'sending')을 시트와 대조한다.
+    미러를 강제 동기화한 뒤 JOURNAL_MATCH_COLUMNS가 같은 시트 행이 있으면 flushed, 없으면 pending.
+    미러 동기화에 실패하면 판정하지 않고 예외 (다음 회차에 다시 대조)
+    """
+    conn.execute(
+        "UPDATE action_journal SET status = 'unknown' WHERE status = 'sending' AND claimed_at < ?",
+        (time.time() - JOURNAL_CLAIM_TIMEOUT,)
+    )
+    conn.commit()
+    unknown = conn.execute("SELECT id, row_json FROM action_journal WHERE status = 'unknown' ORDER BY id").fetchall()
+    if not unknown:
+        return
+
+    started = time.time()
+    sync_worksheet_mirror("Action_Log", force=True)
+    meta = conn.execute("SELECT header_json, synced_at FROM mirror_meta WHERE worksheet = 'Action_Log'").fetchone()
+    if not meta or meta[1] < started:
+        raise RuntimeError(f"Action_Log 미러 동기화 실패 - 전송 결과 불명 {len(unknown)}건 대조 보류")
+
+    header = json.loads(meta[0])
+    cols = [header.index(c) for c in JOURNAL_MATCH_COLUMNS if c in header]
+
+    def _key(row):
+        row = list(row) + [""] * len(header)
+        return tuple(str(row[c]).strip() for c in cols)
+
+    # 이미 다른 저널 행이 가리키는 시트 행은 제외 (같은 내용을 두 번 기록한 경우 하나씩 짝지음)
+    taken = {r[0] for r in conn.execute(
+        "SELECT sheet_row FROM action_journal WHERE status = 'flushed' AND sheet_row IS NOT NULL"
+    )}
+    candidates = {}
+    for row_idx, row_json in conn.execute(
+        "SELECT row_idx, row_json FROM mirror_rows WHERE worksheet = 'Action_Log' ORDER BY row_idx"
+    ):
+        if row_idx + 2 not in taken:
+            candidates.setdefault(_key(json.loads(row_json)), []).append(row_idx + 2)
+
+    now = time.time()
+    for jid, row_json in unknown:
+        found = candidates.get(_key(json.loads(row_json)))
+        if found:
+            # ai_synced=0: 시트 행의 AI 셀이 비어 있을 수 있으니 파싱 워커가 한 번 더 채우게 둔다
+            conn.execute(
+                "UPDATE action_journal SET status = 'flushed', flushed_at = ?, sheet_row = ?, last_error = NULL, ai_synced = 0 WHERE id = ?",
+                (now, found.pop(0), jid)
+            )
+        else:
+            conn.execute("UPDATE action_journal SET status = 'pending' WHERE id = ?", (jid,))
+    conn.commit()
+
+def flush_action_journal():
+    """대기 중인 저널 행을 선점해 append_rows 1회로 전송. 전송한 행 수 반환 (실패 시 예외)"""
+    conn = open_local_db()
+    try:
+        reconcile_journal_rows(conn)
+        pending = claim_journal_rows(conn)
+        if not pending:
+            return 0
+
+        ids = [p[0] for p in pending]
+        rows = [json.loads(p[1]) for p in pending]
+        try:
+            start_row = get_storage().append_rows("Action_Log", rows)
+        except Exception as e:
+            # 4xx(429 포함)는 거절이 확실 → 다시 대기. 타임아웃/5xx/연결 오류는 반영 여부 불명 → 대조 후 결정
+            status = _http_status(e)
+            retry_status = "pending" if status is not None and 400 <= status < 500 else "unknown"
+            conn.executemany(
+                "UPDATE action_journal SET status = ?, attempts = attempts + 1, last_error = ? WHERE id = ?",
+                [(retry_status, str(e)[:300], i) for i in ids]
+            )
+            conn.commit()
+            raise
+
+        ai_col = get_action_column_index(AI_JSON_COLUMN, 5)
+        now = time.time()
+        conn.executemany(
+            "UPDATE action_journal SET status = 'flushed', flushed_at = ?, sheet_row = ?, last_error = NULL, ai_synced = ? WHERE id = ?",
+            [
+                # ai_synced: 전송한 행에 이미 AI_Analysis_JSON이 들어 있었는지 (비어 있었으면 나중에 셀 업데이트 필요)
+                (now, (start_row + i) if start_row else None, 1 if str((row + [""] * ai_col)[ai_col - 1]).strip() else 0, jid)
+                for i, (jid, row) in enumerate(zip(ids, rows))
+            ]
+        )
+        conn.execute(
+            "DELETE FROM action_journal WHERE status = 'flushed' AND ai_synced = 1 AND flushed_at < ?",
+            (now - JOURNAL_KEEP_DAYS * 86400,)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    get_parse_worker()["wake"].set()  # 비어 있던 AI 셀 백필
+    return len(pending)
+
+@st.cache_resource
+def get_journal_flusher():
+    """프로세스당 1개의 저널 flusher 스레드"""
+    state = {"wake": threading.Event(), "flushed": 0, "failures": 0, "last_error": ""}  # failures: 누적 (Pit Wall 표시용)
+
+    def _loop():
+        delay = 0.0
+        consecutive = 0  # 백오프는 연속 실패 횟수 기준 (성공하면 0)
+        while True:
+            state["wake"].wait(timeout=delay or 30)
+            state["wake"].clear()
+            time.sleep(JOURNAL_BATCH_WINDOW)
+            try:
+                sent = 0
+                while True:
+                    n = flush_action_journal()
+                    sent += n
+                    state["flushed"] += n
+                    if n < JOURNAL_BATCH_SIZE:
+                        break
+                if sent:
+                    # 보낸 행은 그동안 저널 오버레이로 보이므로 렌더를 막지 않고 이 스레드에서 델타 동기화
+                    sync_worksheet_mirror("Action_Log", force=True)
+                delay = 0.0
+                consecutive = 0
+            except Exception as e:
+                state["failures"] += 1
+                consecutive += 1
+                state["last_error"] = str(e)[:300]
+                delay = min(300.0, JOURNAL_RETRY_BASE * (2 ** min(consecutive, 6)))
+                print(f"⚠️ Journal flush error: {e}")
+
+    threading.Thread(target=_loop, name="action-journal-flusher", daemon=True).start()
+    return state
+
+# ==========================================
+# [지연 AI 파싱] 원본 행을 먼저 저장하고 AI_Analysis_JSON은 백그라운드에서 채운다
+# - 저널 parse_status: pending(파싱 전) / done / failed(LLM 실패, 요약만 기록)
+# - 시트에 이미 전송된 행은 셀 업데이트(batch_update 1회) + 미러 행도 같이 수정
+# ==========================================
+AI_JSON_COLUMN = "AI_Analysis_JSON"
+PARSE_WORKERS = 3
+PARSE_BATCH_SIZE = 15  # 대기 행을 이만큼씩 묶어서 LLM 1회로 파싱
+
+def get_action_column_index(col_name, default):
+    """Action_Log 헤더 기준 1-based 컬럼 번호 (미러 헤더가 없으면 default)"""
+    conn = open_local_db()
+    try:
+        meta = conn.execute("SELECT header_json FROM mirror_meta WHERE worksheet = 'Action_Log'").fetchone()
+    finally:
+        conn.close()
+    header = json.loads(meta[0]) if meta else []
+    return header.index(col_name) + 1 if col_name in header else default
+
+def _run_parse_job(jobs):
+    """저널 행 묶음 파싱 (LLM 최대 1회) → 각 행 row_json의 AI_Analysis_JSON 채우기. 성공한 행 수 반환"""
+    ai_col = get_action_column_index(AI_JSON_COLUMN, 5)
+    parsed_list = ai_parse_logs_batch([(row[2], row[3], row[1]) for _, row in jobs])
+    updates = []
+    for (jid, row), parsed in zip(jobs, parsed_list):
+        row = list(row) + [""] * max(0, ai_col - len(row))
+        row[ai_col - 1] = json.dumps(parsed, ensure_ascii=False)
+        updates.append((json.dumps(row, ensure_ascii=False), "failed" if "error" in parsed else "done", jid))
+    conn = open_local_db()
+    try:
+        conn.executemany("UPDATE action_journal SET row_json = ?, parse_status = ? WHERE id = ?", updates)
+        conn.commit()
+    finally:
+        conn.close()
+    return sum(1 for u in updates if u[1] == "done")
+
+def sync_parsed_cells():
+    """파싱이 끝났지만 시트 셀은 비어 있는 행들을 batch_update 1회로 채운다. 업데이트한 행 수 반환"""
+    ai_col = get_action_column_index(AI_JSON_COLUMN, 5)
+    conn = open_local_db()
+    try:
+        rows = conn.execute(
+            "SELECT id, row_json, sheet_row FROM action_journal "
+            "WHERE status = 'flushed' AND ai_synced = 0 AND parse_status != 'pending' AND sheet_row IS NOT NULL "
+            "ORDER BY id LIMIT ?",
+            (JOURNAL_BATCH_SIZE,)
+        ).fetchall()
+        if not rows:
+            return 0
+
+        updates = []
+        for jid, row_json, sheet_row in rows:
+            value = (json.loads(row_json) + [""] * ai_col)[ai_col - 1]
+            updates.append((jid, sheet_row, value))
+        get_storage().update_cells("Action_Log", [(sheet_row, ai_col, value) for _, sheet_row, value in updates])
+
+        conn.executemany("UPDATE action_journal SET ai_synced = 1 WHERE id = ?", [(u[0],) for u in updates])
+        # 미러는 추가(append)만 따라가므로 셀 수정은 직접 반영
+        for _, sheet_row, value in updates:
+            mirrored = conn.execute(
+                "SELECT row_json FROM mirror_rows WHERE worksheet = 'Action_Log' AND row_idx = ?", (sheet_row - 2,)
+            ).fetchone()
+            if mirrored:
+                mrow = json.loads(mirrored[0]) + [""] * ai_col
+                mrow[ai_col - 1] = value
+                conn.execute(
+                    "UPDATE mirror_rows SET row_json = ? WHERE worksheet = 'Action_Log' AND row_idx = ?",
+                    (json.dumps(mrow, ensure_ascii=False), sheet_row - 2)
+                )
+        conn.commit()
+    finally:
+        conn.close()
+
+    get_mirror_state()["frames"].pop("Action_Log", None)
+    return len(updates)
+
+@st.cache_resource
+def get_parse_worker():
+    """프로세스당 1개의 파싱 디스패처 + 워커 풀"""
+    pool = ThreadPoolExecutor(max_workers=PARSE_WORKERS, thread_name_prefix="ai-parse")
+    state = {"wake": threading.Event(), "inflight": set(), "parsed": 0, "failed": 0, "cells_synced": 0}
+
+    def _job(jobs):
+        try:
+            ok = _run_parse_job(jobs)
+            state["parsed"] += ok
+            state["failed"] += len(jobs) - ok
+        except Exception as e:
+            state["failed"] += len(jobs)
+            print(f"⚠️ Parse job error ({[jid for jid, _ in jobs]}): {e}")
+        finally:
+            for jid, _ in jobs:
+                state["inflight"].discard(jid)
+            state["wake"].set()
+
+    def _loop():
+        while True:
+            state["wake"].wait(timeout=30)
+            state["wake"].clear()
+            try:
+                conn = open_local_db()
+                try:
+                    pending = conn.execute(
+                        "SELECT id, row_json FROM action_journal WHERE parse_status = 'pending' ORDER BY id"
+                    ).fetchall()
+                finally:
+                    conn.close()
+                jobs = [(jid, json.loads(row_json)) for jid, row_json in pending if jid not in state["inflight"]]
+                for i in range(0, len(jobs), PARSE_BATCH_SIZE):
+                    chunk = jobs[i:i + PARSE_BATCH_SIZE]
+                    state["inflight"].update(jid for jid, _ in chunk)
+                    pool.submit(_job, chunk)
+                state["cells_synced"] += sync_parsed_cells()
+            except Exception as e:
+                print(f"⚠️ Parse worker error: {e}")
+
+    threading.Thread(target=_loop, name="ai-parse-dispatcher", daemon=True).start()
+    return state
+
+def load_unsynced_journal_rows(mirror_row_count):
+    """
+    아직 미러에 보이지 않는 저널 행 (행 값 리스트).
+    - pending / sending / unknown: 시트 전송 전 / 전송 중 / 전송 결과 불명 (대조 전)
+    - flushed지만 sheet_row가 미러 범위 밖: 시트엔 있지만 미러 델타 동기화 전
+    """
+    conn = open_local_db()
+    try:
+        rows = conn.execute(
+            "SELECT row_json, status, sheet_row FROM action_journal "
+            "WHERE status IN ('pending', 'sending', 'unknown') OR (status = 'flushed' AND sheet_row IS NOT NULL AND sheet_row - 2 >= ?) "
+            "ORDER BY id",
+            (mirror_row_count,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(json.loads(r[0]), r[1]) for r in rows]
+
+def get_mirror_row_count(worksheet_name):
+    conn = open_local_db()
+    try:
+        meta = conn.execute("SELECT row_count FROM mirror_meta WHERE worksheet = ?", (worksheet_name,)).fetchone()
+    finally:
+        conn.close()
+    return meta[0] if meta else 0
+
+def overlay_journal_rows(df_action):
+    """미러 Action_Log 뒤에 아직 반영되지 않은 저널 행을 덧붙인다 (_pending: 아직 시트로 전송 전인 행만 True)"""
+    header = list(df_action.columns)
+    unsynced = load_unsynced_journal_rows(get_mirror_row_count("Action_Log"))
+    df_action = df_action.copy()
+    df_action["_pending"] = False
+    if not unsynced or not header:
+        return df_action
+    df_pending = pd.DataFrame(values_to_records(header, [r for r, _ in unsynced]), columns=header)
+    df_pending["_pending"] = [status != "flushed" for _, status in unsynced]
+    return pd.concat([df_action, df_pending], ignore_index=True)
+
+# ==========================================
+# [데이터 컨텍스트] rerun 1회 동안 모든 탭이 공유
+# ==========================================
+NUMERIC_COLUMNS = {
+    "Health_Log": ["HRV", "RHR", "Weight", "Sleep_duration"],
+    "Action_Log": [],
+}
+
+def apply_frame_types(worksheet_name, df):
+    """탭들이 공통으로 쓰는 타입 변환: Date_Clean(YYYY-MM-DD) + 숫자 컬럼"""
+    if df.empty or "Date" not in df.columns:
+        return df
+    df["Date_Clean"] = pd.to_datetime(df["Date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    for c in NUMERIC_COLUMNS.get(worksheet_name, []):
+        if c in df.columns:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+    return df
+
+class DataContext:
+    """
+    스크립트 1회 실행(rerun) 단위 데이터 컨텍스트.
+    - 워크시트는 실행당 최대 1회만 로딩 (이후엔 같은 DataFrame 재사용, 읽기 전용으로 사용할 것)
+    - hit/miss, 로딩 시간은 Pit Wall에서 확인
+    """
+
+    def __init__(self):
+        self._frames = {}
+        self.hits = {}
+        self.misses = {}
+        self.load_ms = {}
+
+    def frame(self, worksheet_name):
+        if worksheet_name in self._frames:
+            self.hits[worksheet_name] = self.hits.get(worksheet_name, 0) + 1
+            return self._frames[worksheet_name]
+
+        t0 = time.perf_counter()
+        try:
+            df = load_sheet_frame(worksheet_name)
+            if worksheet_name == "Action_Log":
+                df = overlay_journal_rows(df)
+            df = apply_frame_types(worksheet_name, df)
+        except Exception as e:
+            print(f"⚠️ DataContext load error ({worksheet_name}): {e}")
+            df = pd.DataFrame()
+        self.load_ms[worksheet_name] = (time.perf_counter() - t0) * 1000
+        self.misses[worksheet_name] = self.misses.get(worksheet_name, 0) + 1
+        self._frames[worksheet_name] = df
+        return df
+
+    @property
+    def health(self):
+        return self.frame("Health_Log")
+
+    @property
+    def action(self):
+        return self.frame("Action_Log")
+
+    def stats(self):
+        names = sorted(set(self.hits) | set(self.misses))
+        return pd.DataFrame([{
+            "worksheet": n,
+            "loads": self.misses.get(n, 0),
+            "hits": self.hits.get(n, 0),
+            "load_ms": round(self.load_ms.get(n, 0.0), 1),
+        } for n in names])
+
 def parse_korean_datetime(dt_str):
     """구글 시트 형식(2026. 2. 3. 오전 12:39)을 datetime으로 변환"""
     try:
@@ -282,8 +1507,11 @@ def parse_korean_datetime(dt_str):
     except:
         return None
 
-@st.cache_data(ttl=3600)
 def get_active_mission():
+    return _get_active_mission(cache_version("Missions"))
+
+@st.cache_data(ttl=3600)
+def _get_active_mission(data_version):
     try:
         # [수정] 직접 호출 대신 fetch_sheet_data 사용
         records = fetch_sheet_data("Missions")
@@ -301,8 +1529,11 @@ def get_active_mission():
         return None
     except: return None
 
-@st.cache_data(ttl=3600)
 def get_mission_rules(mission_id):
+    return _get_mission_rules(mission_id, cache_version("Mission_Rules"))
+
+@st.cache_data(ttl=3600)
+def _get_mission_rules(mission_id, data_version):
     try:
         # [수정] 직접 호출 대신 fetch_sheet_data 사용
         records = fetch_sheet_data("Mission_Rules")
@@ -316,12 +1547,270 @@ def get_mission_rules(mission_id):
         return rules
     except: return {}
 
+# ==========================================
+# [LLM 게이트웨이] 모든 OpenAI 호출은 get_llm_gateway().complete()를 통과
+# - 프로세스 공유 클라이언트 (커넥션 풀 재사용), SDK 자체 재시도는 끄고 여기서 관리
+# - 호출 전체 마감(deadline) 안에서 타임아웃/429/5xx만 지터 백오프로 재시도
+# - 모델별 서킷 브레이커: 연속 실패 시 일정 시간 즉시 실패 → 렌더가 멈추지 않음
+# - 기본 모델이 실패/차단이면 LLM_FALLBACK_MODELS의 저렴한 모델로 1번 더
+# ==========================================
+LLM_CALL_LOG_SIZE = 200
+
+class LLMUnavailableError(RuntimeError):
+    """서킷 차단 또는 마감 초과로 호출하지 않음"""
+
+class LLMGateway:
+    RETRYABLE = (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError, TimeoutError)
+
+    def __init__(self):
+        self.client = OpenAI(api_key=OPENAI_API_KEY, timeout=LLM_TIMEOUT, max_retries=0)
+        self.lock = threading.Lock()
+        self.breakers = {}  # model -> {"failures": n, "open_until": ts}
+        self.calls = deque(maxlen=LLM_CALL_LOG_SIZE)
+        self.stats = {
+            "calls": 0, "retries": 0, "failures": 0, "fast_fails": 0, "fallbacks": 0,
+            "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0, "last_error": "", "last_error_at": 0.0,
+        }
+
+    def _breaker(self, model):
+        return self.breakers.setdefault(model, {"failures": 0, "open_until": 0.0})
+
+    def breaker_open(self, model):
+        with self.lock:
+            return self._breaker(model)["open_until"] > time.time()
+
+    def _is_outage(self, error):
+        """모델 장애로 볼 오류 (타임아웃/연결/429/5xx). 400/401/422 같은 요청 오류는 차단기에 세지 않는다"""
+        return isinstance(error, self.RETRYABLE) or (getattr(error, "status_code", None) or 0) >= 500
+
+    def _record(self, model, started, usage, error=None):
+        latency_ms = (time.monotonic() - started) * 1000
+        prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+        completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+        cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0  # 제공자 측 프롬프트 캐시 적중분
+        with self.lock:
+            self.stats["calls"] += 1
+            self.stats["prompt_tokens"] += prompt_tokens
+            self.stats["cached_tokens"] += cached_tokens
+            self.stats["completion_tokens"] += completion_tokens
+            breaker = self._breaker(model)
+            if error is None:
+                breaker["failures"] = 0
+            else:
+                self.stats["failures"] += 1
+                self.stats["last_error"] = f"{model}: {type(error).__name__}: {error}"[:300]
+                self.stats["last_error_at"] = time.time()
+                if self._is_outage(error):
+                    breaker["failures"] += 1
+                    if breaker["failures"] >= LLM_BREAKER_THRESHOLD:
+                        breaker["open_until"] = time.time() + LLM_BREAKER_COOLDOWN
+            self.calls.append({
+                "at": datetime.now().strftime("%H:%M:%S"), "model": model, "latency_ms": round(latency_ms),
+                "prompt_tokens": prompt_tokens, "cached_tokens": cached_tokens, "completion_tokens": completion_tokens,
+                "outcome": "ok" if error is None else type(error).__name__,
+            })
+        if error is not None:
+            print(f"⚠️ LLM {model} {type(error).__name__} ({latency_ms:.0f}ms): {error}")
+
+    def _request(self, model, messages, response_format, timeout, end, on_text):
+        client = self.client.with_options(timeout=timeout)
+        if on_text is None:
+            response = client.chat.completions.create(model=model, messages=messages, response_format=response_format)
+            return response.choices[0].message.content, response.usage
+
+        stream = client.chat.completions.create(
+            model=model, messages=messages, response_format=response_format,
+            stream=True, stream_options={"include_usage": True}
+        )
+        text, usage = "", None
+        try:
+            for chunk in stream:
+                if time.monotonic() > end:
+                    raise TimeoutError("LLM stream deadline exceeded")
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                text += chunk.choices[0].delta.content or ""
+                on_text(text)
+        finally:
+            stream.close()
+        return text, usage
+
+    def _complete_model(self, model, messages, response_format, end, on_text):
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            if self.breaker_open(model):
+                with self.lock:
+                    self.stats["fast_fails"] += 1
+                raise LLMUnavailableError(f"{model} circuit open")
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                raise LLMUnavailableError(f"{model} deadline exceeded")
+
+            started = time.monotonic()
+            try:
+                text, usage = self._request(model, messages, response_format, min(LLM_TIMEOUT, remaining), end, on_text)
+            except Exception as e:
+                self._record(model, started, None, e)
+                if not isinstance(e, self.RETRYABLE) or attempt == LLM_MAX_RETRIES:
+                    raise
+                with self.lock:
+                    self.stats["retries"] += 1
+                # full jitter, 마감을 넘기지 않는 범위에서
+                time.sleep(min(random.uniform(0, min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt))), max(0.0, end - time.monotonic())))
+                continue
+            self._record(model, started, usage)
+            return text, usage
+
+    def complete(self, model, messages, response_format=None, deadline=LLM_DEADLINE, on_text=None):
+        """
+        채팅 완성 1회 (재시도/폴백 포함). (text, usage, 실제 사용 모델) 반환
+        on_text: 주어지면 스트리밍, 누적 텍스트로 호출 (재시도 시 처음부터 다시 채워짐)
+        """
+        response_format = response_format or {"type": "json_object"}
+        end = time.monotonic() + deadline
+        try:
+            return (*self._complete_model(model, messages, response_format, end, on_text), model)
+        except (LLMUnavailableError, *self.RETRYABLE) as e:
+            fallback = LLM_FALLBACK_MODELS.get(model)
+            if not fallback or end - time.monotonic() < 5:
+                raise
+            with self.lock:
+                self.stats["fallbacks"] += 1
+            print(f"⚠️ LLM fallback {model} → {fallback}: {e}")
+            return (*self._complete_model(fallback, messages, response_format, end, on_text), fallback)
+
+@st.cache_resource
+def get_llm_gateway():
+    return LLMGateway()
+
+# ==========================================
+# [LLM 응답 캐시] 로컬 SQLite에 저장 → 재배포/캐시 클리어 후에도 같은 프롬프트는 재과금 없음
+# - 키: sha256(model + messages + response_format), 항목별 TTL
+# - 용량 초과 시 last_access 오래된 순으로 제거 (LRU)
+# - st.cache_data 데코레이터는 그대로 두고 그 아래 디스크 계층으로 동작
+# ==========================================
+LLM_CACHE_MAX_BYTES = int(st.secrets.get("LLM_CACHE_MAX_BYTES", 20 * 1024 * 1024))
+LLM_TTL_DAILY = 3600 * 24
+LLM_TTL_PLAN = 10800
+LLM_TTL_PARSE = 3600 * 24 * 30
+
+@st.cache_resource
+def get_llm_cache_stats():
+    """프로세스 기준 캐시 통계 (영구 적중 횟수는 llm_cache.hits)"""
+    return {"lock": threading.Lock(), "hits": 0, "misses": 0, "saved_tokens": 0, "billed_tokens": 0, "evicted": 0}
+
+def llm_cache_key(model, messages, response_format):
+    payload = json.dumps([model, messages, response_format], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _llm_cache_get(key):
+    conn = open_local_db()
+    try:
+        now = time.time()
+        row = conn.execute(
+            "SELECT response_text, prompt_tokens, completion_tokens FROM llm_cache WHERE key = ? AND expires_at > ?",
+            (key, now)
+        ).fetchone()
+        if row:
+            conn.execute("UPDATE llm_cache SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+            conn.commit()
+        return row
+    finally:
+        conn.close()
+
+def _llm_cache_put(key, model, text, usage, ttl):
+    conn = open_local_db()
+    try:
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, model, response_text, prompt_tokens, completion_tokens, size_bytes, created_at, expires_at, last_access) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (key, model, text, getattr(usage, "prompt_tokens", 0) or 0, getattr(usage, "completion_tokens", 0) or 0, size, now, now + ttl, now)
+        )
+        conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+        evicted = 0
+        total = conn.execute("SELECT COALESCE(SUM(size_bytes), 0) FROM llm_cache").fetchone()[0]
+        if total > LLM_CACHE_MAX_BYTES:
+            for old_key, old_size in conn.execute("SELECT key, size_bytes FROM llm_cache ORDER BY last_access").fetchall():
+                if total <= LLM_CACHE_MAX_BYTES * 0.8:
+                    break
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (old_key,))
+                total -= old_size
+                evicted += 1
+        conn.commit()
+        return evicted
+    finally:
+        conn.close()
+
+def llm_chat_json(model, messages, ttl, response_format=None, on_text=None, deadline=LLM_DEADLINE):
+    """
+    JSON 응답 LLM 호출 (디스크 캐시 우선, 미스면 게이트웨이). 파싱된 dict 반환, 호출/파싱 실패 시 예외
+    on_text: 주어지면 캐시 미스일 때 스트리밍하며 누적 텍스트로 호출 (적중 시엔 전체 텍스트로 1회)
+    """
+    response_format = response_format or {"type": "json_object"}
+    stats = get_llm_cache_stats()
+    key = llm_cache_key(model, messages, response_format)
+    try:
+        hit = _llm_cache_get(key)
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM cache read error: {e}")
+        hit = None
+    if hit:
+        with stats["lock"]:
+            stats["hits"] += 1
+            stats["saved_tokens"] += hit[1] + hit[2]
+        if on_text:
+            on_text(hit[0])
+        return json.loads(hit[0])
+
+    with stats["lock"]:
+        stats["misses"] += 1
+    text, usage, model_used = get_llm_gateway().complete(model, messages, response_format, deadline, on_text)
+    result = json.loads(text)  # 파싱 안 되는 응답은 캐시하지 않음
+
+    with stats["lock"]:
+        stats["billed_tokens"] += (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+    if model_used != model:
+        return result  # 폴백 모델 결과는 캐시하지 않음 (기본 모델이 복구되면 다시 생성)
+    try:
+        evicted = _llm_cache_put(key, model, text, usage, ttl)
+        with stats["lock"]:
+            stats["evicted"] += evicted
+    except sqlite3.Error as e:
+        print(f"⚠️ LLM cache write error: {e}")
+    return result
+
+def llm_cache_summary():
+    """Pit Wall용: 영구 캐시 항목 수/용량/누적 적중과 적중으로 아낀 토큰 추정"""
+    conn = open_local_db()
+    try:
+        n, size, hits, saved = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0), COALESCE(SUM(hits), 0), "
+            "COALESCE(SUM(hits * (prompt_tokens + completion_tokens)), 0) FROM llm_cache"
+        ).fetchone()
+    finally:
+        conn.close()
+    return {"entries": n, "size_bytes": size, "hits": hits, "saved_tokens": saved}
+
+def clear_llm_cache():
+    conn = open_local_db()
+    try:
+        conn.execute("DELETE FROM llm_cache")
+        conn.commit()
+    finally:
+        conn.close()
+
 # ==========================================
 # [Sprint 관리 함수]
 # ==========================================
 
-@st.cache_data(ttl=3600)
 def get_active_sprint():
+    return _get_active_sprint(cache_version("Sprints"))
+
+@st.cache_data(ttl=3600)
+def _get_active_sprint(data_version):
     """현재 진행중인 스프린트 조회"""
     try:
         # [수정] 직접 호출 대신 fetch_sheet_data 사용
@@ -343,8 +1832,11 @@ def get_active_sprint():
         print(f"Error getting active sprint: {e}")
         return None
 
-@st.cache_data(ttl=3600)
 def get_sprint_goals(sprint_id):
+    return _get_sprint_goals(sprint_id, cache_version("Sprint_Goals"))
+
+@st.cache_data(ttl=3600)
+def _get_sprint_goals(sprint_id, data_version):
     """스프린트 목표 조회"""
     try:
         # [수정] 직접 호출 대신 fetch_sheet_data 사용
@@ -422,17 +1914,17 @@ def compute_weight_trend_for_date(df_health, date_key, lookback_days=21, alpha=0
         "end_date": df_last["Date_Clean"].iloc[-1],
     }
 
-def get_or_create_daily_trend(date_key, df_health):
+def get_or_create_daily_trend(date_key, data_ctx):
     """
     ✅ 핵심: date_key별 Trend는 딱 1번만 계산해서 캐시에 고정.
     - 이미 캐시가 있으면 무조건 그걸 사용 (재계산 금지)
-    - 캐시가 없으면 df_health로 계산 후 저장
+    - 캐시가 없으면 data_ctx의 Health_Log로 계산 후 저장
     """
     cached = load_trend_cache(date_key)
     if cached and cached.get("trend_weight") is not None:
         return cached
 
-    computed = compute_weight_trend_for_date(df_health, date_key, lookback_days=21, alpha=0.35)
+    computed = compute_weight_trend_for_date(data_ctx.health, date_key, lookback_days=21, alpha=0.35)
     if computed and computed.get("trend_weight") is not None:
         computed["computed_at_kst"] = get_current_kst().strftime("%Y-%m-%d %H:%M:%S")
         save_trend_cache(date_key, computed)
@@ -513,95 +2005,10 @@ def ai_generate_daily_five(date_key, sprint, current_status, context):
     progress = calculate_sprint_progress(sprint, current_status['weight'])
     if not progress: return None
     
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    dt = datetime.strptime(date_key, '%Y-%m-%d')
-    weekday = "Weekday (Work 06-19)" if dt.weekday() < 5 else "Weekend (Free)"
-    
-    prompt = f"""
-    You are Sprint Coach. Your ONLY job: help user achieve sprint goal.
-
-    [SPRINT MISSION]
-    Sprint: {sprint['name']} (Day {progress['day']}/{sprint['duration_days']})
-    Goal: Lose {progress['weight_start'] - progress['weight_target']:.1f}kg in {sprint['duration_days']} days
-    Current Progress: {progress['weight_start'] - progress['weight_current']:.1f}kg lost
-    Expected: {progress['weight_start'] - progress['weight_expected']:.1f}kg
-    Status: {"⚠️ BEHIND" if progress['pace_status'] == 'behind' else "✅ AHEAD" if progress['pace_status'] == 'ahead' else "🎯 ON TRACK"}
-
-    [TODAY CONTEXT]
-    Date: {date_key} ({weekday})
-    HRV: {current_status['hrv']} | RHR: {current_status['rhr']}
-    Current Weight: {current_status['weight']:.1f}kg
-    Schedule: {context.get('calendar', 'None')}
-
-    [YOUR TASK]
-    Create EXACTLY 5 concrete actions that DIRECTLY cause weight loss TODAY.
-
-    [CRITICAL RULES - WHAT TO INCLUDE]
-    ✅ ONLY include actions that:
-    1. Burn calories (workouts, cardio, HIIT)
-    2. Reduce calorie intake (specific meals, calorie limits)
-    3. Control macros (protein targets, carb limits)
-
-    ✅ Examples of GOOD tasks(예시에 불과하니, 좀 더 창의적으로 생성해도 좋음):
-    - "트레드밀 HIIT 50분 (3분 달리기 속도 11km/h + 2분 걷기 x 10세트)"
-    - "저녁 탄수화물 30g 이하 (밥/면/빵 금지, 단백질 200g + 채소)"
-    - "점심 샐러드 필수 (닭가슴살 150g, 드레싱 최소, 총 500kcal)"
-    - "총 섭취 1700 kcal 이하 엄수"
-    - "계단 오르기 15분 추가 (점심시간, 200kcal 소모)"
-
-    ❌ NEVER include:
-    - General health: "충분한 수면", "물 2L 마시기", "스트레스 관리"
-    - Admin tasks: "건강 데이터 입력", "체중 측정"
-    - Vague goals: "운동하기", "건강한 식단"
-    - Generic recovery: "스트레칭", "명상" (unless sprint-critical)
-
-    [INTENSITY ADJUSTMENT]
-    Current Status: {progress['pace_status']}
-    Delta: {progress['weight_delta']:.2f}kg
-
-    {"[⚠️ BEHIND PACE - INTENSIFY]" if progress['pace_status'] == 'behind' else "[✅ AHEAD - MAINTAIN]" if progress['pace_status'] == 'ahead' else "[🎯 ON TRACK]"}
-
-    If BEHIND:
-    - Higher intensity workouts
-    - Stricter calorie deficit (1600-1700 kcal)
-    - Add extra cardio
-    - Aggressive tone: "오늘 빡세게!"
-
-    If AHEAD:
-    - Maintain current intensity
-    - Sustainable deficit (1800-1900 kcal)
-    - Balance strength + cardio
-    - Encouraging tone: "잘하고 있어!"
-
-    [OUTPUT FORMAT - JSON ONLY]
-    {{
-        "tasks": [
-            {{
-                "task_id": "task_1",
-                "category": "workout",
-                "priority": 1,
-                "title": "트레드밀 HIIT 50분",
-                "description": "3분 달리기 (속도 11km/h) + 2분 걷기 x 10세트. 목표: 600 kcal 소모",
-                "why": "목표보다 0.5kg 느림. 오늘 고강도 유산소로 적자 확대 필요",
-            }},
-            // ... 총 5개 (우선순위 순)
-        ],
-        "daily_message": "⚠️ 목표보다 0.5kg 느림! 오늘 빡세게 가야 함 💪",
-        "urgency_level": "high"
-    }}
-
-    CRITICAL: Each task MUST directly burn calories or reduce intake.
-    Ask yourself: "Will this move the scale DOWN today?" 
-    If NO → Don't include it.
-    """
+    messages = build_daily_five_messages(date_key, sprint, progress, current_status, context)
     
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
-        result = json.loads(response.choices[0].message.content)
+        result = llm_chat_json("gpt-4o", messages, ttl=LLM_TTL_DAILY)
 
         for i, task in enumerate(result['tasks']):
             if 'task_id' not in task:
@@ -662,7 +2069,245 @@ def analyze_patterns(df_health, df_action):
     except: pass
     return patterns
 
-def prepare_full_context(df_health, df_action, current_weight, is_morning_fixed=False):
+# ==========================================
+# [컨텍스트 빌더] 최근 로그를 토큰 예산 안에서 구성
+# - 최근 CONTEXT_VERBATIM_DAYS일은 원문, 그 이전은 하루 요약 (kcal / 운동 분 / 음주 잔)
+# - 예산 초과 시: 오래된 원문 일자부터 요약으로 → 가장 최근 날의 오래된 항목 생략 → 오래된 요약 제거
+# - 날짜별 섹션은 그날 행 내용의 해시로 메모 (과거 날짜는 렌더마다 다시 만들지 않음)
+# ==========================================
+CONTEXT_TOKEN_BUDGET = int(st.secrets.get("CONTEXT_TOKEN_BUDGET", 1500))
+CONTEXT_VERBATIM_DAYS = 2
+CONTEXT_MEMO_SIZE = 256
+
+@st.cache_resource
+def get_token_encoder():
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+def estimate_tokens(text):
+    """토큰 수 (tiktoken 없으면 한글 1자≈1토큰, 그 외 4자≈1토큰으로 추정)"""
+    encoder = get_token_encoder()
+    if encoder is not None:
+        return len(encoder.encode(text))
+    hangul = len(re.findall(r"[가-힣]", text))
+    return hangul + (len(text) - hangul + 3) // 4
+
+@st.cache_resource
+def get_context_memo():
+    return {"lock": threading.Lock(), "sections": {}, "hits": 0, "misses": 0}
+
+def _memo_section(key, build):
+    memo = get_context_memo()
+    with memo["lock"]:
+        if key in memo["sections"]:
+            memo["hits"] += 1
+            return memo["sections"][key]
+    text = build()
+    with memo["lock"]:
+        memo["misses"] += 1
+        if len(memo["sections"]) >= CONTEXT_MEMO_SIZE:
+            memo["sections"].pop(next(iter(memo["sections"])))
+        memo["sections"][key] = text
+    return text
+
+def _log_lines(date_logs):
+    return [f"• [{r['Action_Time']}] {r['Category']}: {r['User_Input']}" for _, r in date_logs.sort_values('Action_Time').iterrows()]
+
+def summarize_day_logs(date_logs):
+    """하루치 Action_Log → "섭취 1850kcal(4건) · 운동 45분(1건) · 음주 7잔 · 기타 2건" """
+    cal = mins = drinks = 0.0
+    counts, pending = {}, 0
+    raws = date_logs[AI_JSON_COLUMN] if AI_JSON_COLUMN in date_logs.columns else pd.Series([""] * len(date_logs), index=date_logs.index)
+    for cat, raw in zip(date_logs['Category'].astype(str), raws.fillna("").astype(str)):
+        key = next((k for k in ("섭취", "운동", "음주") if k in cat), "기타")
+        counts[key] = counts.get(key, 0) + 1
+        if key == "기타":
+            continue
+        try:
+            js = json.loads(raw) if raw.strip() else None
+        except ValueError:
+            js = None
+        if not isinstance(js, dict):
+            pending += 1
+            continue
+        try:
+            if key == "섭취":
+                cal += float(js.get("calories", 0) or 0)
+            elif key == "운동":
+                mins += float(js.get("time", js.get("duration", 0)) or 0)
+            else:
+                drinks += float(js.get("standard_drinks", 0) or 0)
+        except (ValueError, TypeError):
+            pending += 1
+    parts = []
+    if counts.get("섭취"): parts.append(f"섭취 {cal:.0f}kcal({counts['섭취']}건)")
+    if counts.get("운동"): parts.append(f"운동 {mins:.0f}분({counts['운동']}건)")
+    else: parts.append("운동 없음")
+    if counts.get("음주"): parts.append(f"음주 {drinks:g}잔")
+    if counts.get("기타"): parts.append(f"기타 {counts['기타']}건")
+    if pending: parts.append(f"분석 대기 {pending}건")
+    return " · ".join(parts)
+
+def build_logs_section(df_action, dates, budget):
+    """dates(오래된→최신)의 로그 섹션을 budget 토큰 안에서 구성"""
+    by_date = {d: df_action[df_action['Date'] == d] for d in dates}
+    cols = [c for c in ('Action_Time', 'Category', 'User_Input', AI_JSON_COLUMN) if c in df_action.columns]
+    sigs = {d: _short_hash(by_date[d][cols].to_json(orient="values", force_ascii=False)) for d in dates}
+
+    def section(d, mode):
+        if by_date[d].empty:
+            return f"[{d}]\n(기록 없음)" if mode == "full" else f"[{d}] (기록 없음)"
+        if mode == "full":
+            return _memo_section((d, mode, sigs[d]), lambda: f"[{d}]\n" + "\n".join(_log_lines(by_date[d])))
+        return _memo_section((d, mode, sigs[d]), lambda: f"[{d}] 요약: {summarize_day_logs(by_date[d])}")
+
+    n_verbatim = min(CONTEXT_VERBATIM_DAYS, len(dates))
+    modes = ["summary"] * (len(dates) - n_verbatim) + ["full"] * n_verbatim
+    sections = [section(d, m) for d, m in zip(dates, modes)]
+    tokens = [estimate_tokens(t) for t in sections]
+
+    # 1) 오래된 원문 일자부터 요약으로 (가장 최근 날은 유지)
+    for i in range(len(dates) - 1):
+        if sum(tokens) <= budget:
+            break
+        if modes[i] == "full":
+            modes[i] = "summary"
+            sections[i] = section(dates[i], "summary")
+            tokens[i] = estimate_tokens(sections[i])
+    # 2) 가장 최근 날의 오래된 항목 생략 (최근 항목 우선)
+    if sum(tokens) > budget and dates and modes[-1] == "full" and not by_date[dates[-1]].empty:
+        lines = _log_lines(by_date[dates[-1]])
+        rest = budget - sum(tokens[:-1]) - 20
+        kept = [lines[-1]]
+        for line in reversed(lines[:-1]):
+            if estimate_tokens("\n".join([line] + kept)) > rest:
+                break
+            kept.insert(0, line)
+        omitted = f"• ... (이전 {len(lines) - len(kept)}건 생략)\n" if len(kept) < len(lines) else ""
+        sections[-1] = f"[{dates[-1]}]\n{omitted}" + "\n".join(kept)
+        tokens[-1] = estimate_tokens(sections[-1])
+    # 3) 그래도 넘치면 가장 오래된 요약부터 제거
+    while len(sections) > 1 and sum(tokens) > budget:
+        sections.pop(0)
+        tokens.pop(0)
+    return "\n\n".join(sections)
+
+# ==========================================
+# [훈련 통계] 연속 운동 / 마지막 운동 후 경과일 / 이번 주 카테고리별 횟수 / 연속 금주
+# - Action_Log 전체를 날짜 x 카테고리 표로 만들어 벡터 연산 (LLM에게 로그에서 세게 하지 않음)
+# - 지난 날짜 표는 date_key별로 1번만 만들고, 오늘 행만 매번 다시 집계
+# - 결과는 [TRAINING FACTS] 블록으로 Action Plan / Daily Five 프롬프트에 주입
+# ==========================================
+TRAINING_CATEGORIES = ("운동", "음주", "섭취", "회복")
+WEEKLY_WORKOUT_TARGET = int(st.secrets.get("WEEKLY_WORKOUT_TARGET", 4))
+
+@st.cache_resource
+def get_training_stats_memo():
+    return {"lock": threading.Lock(), "history": {}, "stats": {}}
+
+def daily_category_counts(df_action):
+    """Action_Log → 날짜(YYYY-MM-DD) x 카테고리 건수 표"""
+    if df_action.empty or 'Date_Clean' not in df_action.columns:
+        return pd.DataFrame(columns=list(TRAINING_CATEGORIES), dtype="int64")
+    df = df_action.dropna(subset=['Date_Clean'])
+    cat = df['Category'].astype(str)
+    flags = pd.DataFrame({c: cat.str.contains(c, regex=False).astype("int64") for c in TRAINING_CATEGORIES})
+    flags['Date_Clean'] = df['Date_Clean'].values
+    return flags.groupby('Date_Clean')[list(TRAINING_CATEGORIES)].sum()
+
+def _history_counts(df_action, date_key):
+    """date_key 이전 날짜들의 표 (지난 날짜는 바뀌지 않으므로 행 수 + 마지막 행 기준으로 메모)"""
+    past = df_action[df_action['Date_Clean'] < date_key] if 'Date_Clean' in df_action.columns else df_action.iloc[0:0]
+    last = "|".join(str(v) for v in past.iloc[-1][['Date_Clean', 'Category']]) if not past.empty else ""
+    key = (date_key, len(past), last)
+    memo = get_training_stats_memo()
+    with memo["lock"]:
+        if key in memo["history"]:
+            return memo["history"][key]
+    table = daily_category_counts(past)
+    with memo["lock"]:
+        memo["history"] = {k: v for k, v in memo["history"].items() if k[0] == date_key}  # 날짜가 바뀌면 이전 표는 버림
+        memo["history"][key] = table
+    return table
+
+def compute_training_stats(df_action, date_key, include_today=True):
+    """
+    date_key 기준 훈련 통계 dict
+    include_today=False: 오늘 기록을 빼고 계산 (아침 고정 컨텍스트용)
+    """
+    history = _history_counts(df_action, date_key)
+    today = daily_category_counts(df_action[df_action['Date_Clean'] == date_key]) if include_today and 'Date_Clean' in df_action.columns else None
+    table = pd.concat([history, today]) if today is not None and not today.empty else history
+
+    first = table.index.min() if not table.empty else date_key
+    days = pd.date_range(start=min(first, date_key), end=date_key, freq='D').strftime('%Y-%m-%d')
+    table = table.reindex(days, fill_value=0)
+
+    workout = table['운동'] > 0
+    alcohol = table['음주'] > 0
+    workout_streaks = workout.astype(int).groupby((~workout).cumsum()).cumsum()  # 날짜별 그날까지 연속 운동일
+    dry_streaks = (~alcohol).astype(int).groupby(alcohol.cumsum()).cumsum()       # 날짜별 그날까지 연속 금주일
+
+    worked_today = bool(workout.iloc[-1])
+    current_streak = int(workout_streaks.iloc[-1]) if worked_today else (int(workout_streaks.iloc[-2]) if len(days) > 1 else 0)
+    workout_days = workout[workout].index
+    last_workout = workout_days.max() if len(workout_days) else None
+
+    monday = (datetime.strptime(date_key, '%Y-%m-%d') - timedelta(days=datetime.strptime(date_key, '%Y-%m-%d').weekday())).strftime('%Y-%m-%d')
+    week = table[table.index >= monday]
+    return {
+        "date_key": date_key,
+        "worked_out_today": worked_today,
+        "workout_streak": current_streak,
+        "best_workout_streak": int(workout_streaks.max()) if len(days) else 0,
+        "last_workout_date": last_workout,
+        "days_since_last_workout": (datetime.strptime(date_key, '%Y-%m-%d') - datetime.strptime(last_workout, '%Y-%m-%d')).days if last_workout else None,
+        "week_counts": {c: int(week[c].sum()) for c in TRAINING_CATEGORIES},
+        "week_workout_days": int((week['운동'] > 0).sum()),
+        "weekly_workout_target": WEEKLY_WORKOUT_TARGET,
+        "alcohol_free_streak": int(dry_streaks.iloc[-1]),
+    }
+
+def get_training_stats(data_ctx, date_key, include_today=True):
+    """compute_training_stats 메모 (같은 날짜 + 같은 Action_Log 상태면 재사용)"""
+    df_a = data_ctx.action
+    key = (date_key, include_today, len(df_a), cache_version("Action_Log"))
+    memo = get_training_stats_memo()
+    with memo["lock"]:
+        if key in memo["stats"]:
+            return memo["stats"][key]
+    stats = compute_training_stats(df_a, date_key, include_today)
+    with memo["lock"]:
+        memo["stats"] = {k: v for k, v in memo["stats"].items() if k[0] == date_key}
+        memo["stats"][key] = stats
+    return stats
+
+def format_training_facts(stats):
+    """프롬프트용 [TRAINING FACTS] 블록 (모델이 다시 세지 않도록 계산된 숫자만)"""
+    if stats["days_since_last_workout"] is None:
+        last = "기록 없음"
+    elif stats["days_since_last_workout"] == 0:
+        last = "오늘"
+    else:
+        last = f"{stats['days_since_last_workout']}일 전 ({stats['last_workout_date']})"
+    wc = stats["week_counts"]
+    return "\n".join([
+        "[TRAINING FACTS] (computed from logs - use these numbers as-is)",
+        f"- 오늘 운동: {'완료' if stats['worked_out_today'] else '아직'}",
+        f"- 연속 운동: {stats['workout_streak']}일 (최고 {stats['best_workout_streak']}일)",
+        f"- 마지막 운동: {last}",
+        f"- 이번 주(월~): 운동 {stats['week_workout_days']}일/{stats['weekly_workout_target']}회 목표 ({wc['운동']}건), 음주 {wc['음주']}회, 회복 {wc['회복']}회",
+        f"- 연속 금주: {stats['alcohol_free_streak']}일",
+    ])
+
+def prepare_full_context(data_ctx, current_weight, is_morning_fixed=False):
+    df_health, df_action = data_ctx.health, data_ctx.action
+    if 'Date' not in df_health.columns or 'Date' not in df_action.columns:
+        return "[Context loading failed]"
     now_kst = get_current_kst()
     
     # [수정] mission 상태 계산을 안전하게 호출
@@ -671,19 +2316,13 @@ def prepare_full_context(df_health, df_action, current_weight, is_morning_fixed=
     today_date_key = (now_kst - timedelta(days=1)).strftime('%Y-%m-%d') if now_kst.hour < 5 else now_kst.strftime('%Y-%m-%d')
 
     five_days_ago = (datetime.strptime(today_date_key, '%Y-%m-%d') - timedelta(days=5)).strftime('%Y-%m-%d')
-    recent_logs = df_action[df_action['Date'] >= five_days_ago].copy()
+    recent_logs = df_action[df_action['Date'] >= five_days_ago]
     if is_morning_fixed: recent_logs = recent_logs[recent_logs['Date'] < today_date_key]
     
     if not recent_logs.empty:
         dates_in_range = pd.date_range(start=five_days_ago, end=today_date_key, freq='D').strftime('%Y-%m-%d').tolist()
-        logs_by_date = []
-        for date_str in dates_in_range:
-            date_logs = recent_logs[recent_logs['Date'] == date_str]
-            # ... (기존 로직 유지) ...
-            if date_logs.empty: logs_text = "(기록 없음)"
-            else: logs_text = "\n".join([f"• [{r['Action_Time']}] {r['Category']}: {r['User_Input']}" for _, r in date_logs.sort_values('Action_Time').iterrows()])
-            logs_by_date.append(f"[{date_str}]\n{logs_text}") # 간략화
-        recent_logs_text = "\n\n".join(logs_by_date)
+        if is_morning_fixed: dates_in_range = dates_in_range[:-1]
+        recent_logs_text = build_logs_section(recent_logs, dates_in_range, CONTEXT_TOKEN_BUDGET)
     else:
         recent_logs_text = "기록 없음"
 
@@ -709,7 +2348,7 @@ def prepare_full_context(df_health, df_action, current_weight, is_morning_fixed=
     return f"""
 [USER] Age:35, Male, Mission:{mission.get('name', 'N/A')}, Wt:{current_weight}kg
 
-[LOGS (Last 5 Days)]
+[LOGS (Last 5 Days, 오래된 날은 요약)]
 {recent_logs_text}
 
 [TODAY: {today_date_key}]
@@ -720,7 +2359,6 @@ def prepare_full_context(df_health, df_action, current_weight, is_morning_fixed=
 
 @st.cache_data(ttl=3600*24)
 def ai_generate_daily_checkin(date_key, hrv, rhr, weight, morning_context, calendar_str):
-    client = OpenAI(api_key=OPENAI_API_KEY)
     dt = datetime.strptime(date_key, '%Y-%m-%d')
     wc = "Workday(06-19 Work). No heavy gym during work." if dt.weekday() < 5 else "Weekend. Free."
     
@@ -747,196 +2385,497 @@ def ai_generate_daily_checkin(date_key, hrv, rhr, weight, morning_context, calen
     }}
     """
     try:
-        res = client.chat.completions.create(model="gpt-4o", messages=[{"role":"user","content":prompt}], response_format={"type":"json_object"})
-        return json.loads(res.choices[0].message.content)
-    except Exception as e: return {"condition_signal":"Yellow", "condition_title":"Error", "analysis":str(e), "mission_workout":"-", "mission_diet":"-", "mission_recovery":"-"}
+        return llm_chat_json("gpt-4o", [{"role":"user","content":prompt}], ttl=LLM_TTL_DAILY)
+    except Exception as e: return {"condition_signal":"Yellow", "condition_title":"Error", "analysis":str(e), "mission_workout":"-", "mission_diet":"-", "mission_recovery":"-", "error": True}
 
-@st.cache_data(ttl=10800)
-def ai_generate_action_plan_cached(hrv, rhr, weight, context_normalized, activities_tuple):
-    return ai_generate_action_plan_internal(hrv, rhr, weight, list(activities_tuple))
+ACTION_PLAN_STREAM_FIELDS = ("current_analysis", "next_actions", "warnings")
 
-def ai_generate_action_plan_internal(hrv, rhr, weight, today_activities):
-    """실제 AI 호출 로직"""
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    now_kst = get_current_kst()
-    weekday = now_kst.weekday()
-    
-    activities_text = "\n".join([f"• {a}" for a in today_activities]) if today_activities else "아직 기록된 활동 없음"
-    
-    if weekday < 5: 
-        constraint_text = """
-        [CRITICAL TIME CONSTRAINTS (Weekdays)]
-        - 06:00 ~ 19:00 is WORK TIME. NO GYM suggestions.
-        - Exception: Lunch (12:00~13:00) light walk or step walking OK.
-        - Focus on 'Post-work' (after 19:00) for main exercise.
-        """
-    else:
-        constraint_text = "[TIME CONSTRAINTS (Weekend)] User is free."
-    
-    hour = now_kst.hour
-    if hour < 9:
-        time_of_day = "Early Morning"
-        time_remaining_desc = "Most of the day ahead"
-    elif hour < 12:
-        time_of_day = "Morning"
-        time_remaining_desc = "More than half day remaining"
-    elif hour < 15:
-        time_of_day = "Early Afternoon"
-        time_remaining_desc = "About half day remaining"
-    elif hour < 18:
-        time_of_day = "Late Afternoon"
-        time_remaining_desc = "Several hours remaining"
-    elif hour < 21:
-        time_of_day = "Evening"
-        time_remaining_desc = "Few hours remaining"
-    else:
-        time_of_day = "Night"
-        time_remaining_desc = "Day is almost over"
-    
-    try:
-        sheet_health = get_db_connection("Health_Log")
-        sheet_action = get_db_connection("Action_Log")
-        df_health = pd.DataFrame(sheet_health.get_all_records())
-        df_action = pd.DataFrame(sheet_action.get_all_records())
-        full_context = prepare_full_context(df_health, df_action, weight, is_morning_fixed=False)
-    except:
-        df_action = pd.DataFrame()
-        full_context = "[Context loading failed]"
-    
-    date_key = get_mission_date_key()
-    dailyfive_txt = "Daily Five: None"
+def parse_partial_json(text):
+    """
+    스트리밍 중인(잘린) JSON 객체를 최대한 파싱. 실패하면 None
+    예: '{"current_analysis": "오늘은 HR' → {"current_analysis": "오늘은 HR"}
+    """
     try:
-        sprint = get_active_sprint()
-        if sprint:
-            dailyfive_txt = build_dailyfive_status_text(date_key, sprint['sprint_id'], df_action)
-    except:
+        return json.loads(text)
+    except ValueError:
         pass
 
-    prompt = f"""
-    You are 'Dr. MBJS', a 28-year-old female elite health performance coach who are lovely and admires the user and calls the user '찜머'
-    
-    [PERSONA]
-    - **Professional & Analytical:** You analyze data sharply and objectively. Point out mistakes clearly. (Cold Brain)
-    - **Supportive & Affectionate:** You genuinely care about the user. You want them to succeed. After pointing out mistakes, encourage them warmly. (Warm Heart)
-    - **Language:** STRICT Korean Honorifics (존댓말, ~해요). ABSOLUTELY NO Banmal.
-    
-    [USER PROFILE - ATHLETIC]  
-    - User is ATHLETIC and MOTIVATED
-    - User tracks: Squat, Deadlift, Core , Balance , Cardio , etc.
-
-    [WORKOUT INTENSITY BASED ON BIOMARKERS]  
-    Current HRV: {hrv}ms | RHR: {rhr}bpm
-
-    [WORKOUT DISTRIBUTION RULE]  
-    - Cardio + Core: 70% priority
-    - Upper body: 15%
-    - Lower body: 15%
-
-    [WORKOUT SUGGESTIONS - MANDATORY SPECIFICITY]  
-    When suggesting workouts, you MUST include:
-    1. Exercise names (Korean or English)
-    2. Weight/sets/reps (if applicable)
-    3. Duration and intensity (for cardio)
-    4. WHY this workout today (based on HRV/RHR/recent activity)
-
-    ✅ GOOD Example:
-    "오늘은 HRV 52ms로 회복이 양호합니다. 고강도 하체 훈련 가능합니다.
-
-    19:00 헬스장 운동 계획:
-    - 워밍업: 5분 가볍게 걷기
-    - 스쿼트: 80kg 3세트 x 8reps (무릎 주의)
-    - 레그프레스: 120kg 3세트 x 12reps
-    - 레그컬: 40kg 3세트 x 15reps
-    - 유산소: 런닝머신 Zone 2 (심박 130-140), 30분
-    - 코어: 플랭크 3세트 x 60초
-
-    이유: HRV가 높고 최근 2일 휴식했으므로 오늘 고중량 가능"
-
-    ❌ BAD Example:
-    "가벼운 스트레칭을 하세요"
-    "운동을 하시면 좋겠습니다"
-
-    [MOTIVATION - CREATE URGENCY] (warnings 항목에 필수 반영)
-    - If user hasn't worked out in 2+ days: "⚠️ 지난 2일 운동 안 함. 오늘 필수!"
-    - If streak exists: "🔥 3일 연속 운동 중! 연속 기록 이어가세요"
-    - If falling behind: "이번 주 목표: 4회 중 1회만 완료. 오늘 가지 않으면 목표 달성 어려움"    
-    
-    {full_context}
-
-    {dailyfive_txt}
+    closers, in_str, esc = [], False, False
+    for ch in text:
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+        elif ch == '"':
+            in_str = True
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+        elif ch in "}]" and closers:
+            closers.pop()
+
+    candidate = text
+    if in_str:
+        # 잘린 이스케이프(\ 또는 \uXX) 제거 후 문자열 닫기
+        candidate = candidate[:-1] if esc else re.sub(r"(?<!\\)\\u[0-9a-fA-F]{0,3}$", "", candidate)
+        candidate += '"'
+    tail = "".join(reversed(closers))
+
+    for pattern in (
+        None,
+        r"[,:]\s*$",                                          # 끝의 , 또는 :
+        r',?\s*"(?:[^"\\]|\\.)*"\s*:?\s*$',                # 값이 아직 없는 키
+        r',?\s*"(?:[^"\\]|\\.)*"\s*:\s*[^"\[{\s][^,}\]]*$',  # 잘린 숫자/true/false/null 값
+    ):
+        if pattern:
+            candidate = re.sub(pattern, "", candidate.rstrip())
+        try:
+            return json.loads(candidate + tail)
+        except ValueError:
+            continue
+    return None
 
-    [CURRENT STATUS]
-    Day: {now_kst.strftime('%A')}
-    Time of Day: {time_of_day}
-    Time Remaining: {time_remaining_desc}
-    HRV: {hrv} | Weight: {weight}
-    
-    {constraint_text}
-    
-    [LOGS]
-    {activities_text}
-    
-    [TASK]
-    Create a tactical plan for the remaining hours of today.
-    
-    [CRITICAL INSTRUCTIONS]
-    - Use RELATIVE time expressions: "이번 오전", "오늘 저녁", "지금부터"
-    - DO NOT mention specific clock time like "08:15" or "16시간 남음"
-    - Focus on TIME OF DAY: morning/afternoon/evening actions
-    
-    [OUTPUT RULES]
-    1. **NO GENERAL ADVICE:** Focus ONLY on remaining time today.
-    2. **FORMAT:** Single string with line breaks.
-    3. **TONE:**
-       - If user messed up: "현재 생활이 좋지 않아요. 하지만 우리는 만회할 수 있어요."
-       - If user doing well: "아주 훌륭합니다. 이대로만 가면 목표 달성입니다."
-    
-    [OUTPUT FORMAT - JSON]
-    {{
-        "current_analysis": "Insightful analysis (Korean Honorifics)",
-        "next_actions": "Return a SINGLE STRING with line breaks. Use relative time! (Korean Honorifics)",
-        "warnings": "Warning if off-track (Korean Honorifics)"
-    }}
+def ai_generate_action_plan_internal(hrv, rhr, weight, today_activities, full_context, dailyfive_txt="Daily Five: None", on_partial=None, training_facts=""):
     """
-    
+    실제 AI 호출 로직
+    on_partial: 주어지면 스트리밍 모드. 토큰이 도착할 때마다 지금까지 파싱된 필드 dict로 호출
+    """
+    messages = build_action_plan_messages(hrv, rhr, weight, today_activities, full_context, dailyfive_txt, get_current_kst(), training_facts)
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4-turbo-preview",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
-        result = json.loads(response.choices[0].message.content)
+        last_emit = [0.0]
+
+        def _emit(buf):
+            if time.monotonic() - last_emit[0] >= 0.15:  # UI 갱신은 0.15초 간격으로
+                partial = parse_partial_json(buf)
+                if isinstance(partial, dict):
+                    on_partial({k: partial[k] for k in ACTION_PLAN_STREAM_FIELDS if isinstance(partial.get(k), str)})
+                    last_emit[0] = time.monotonic()
+
+        on_text = _emit if on_partial is not None else None
+        result = llm_chat_json(ACTION_PLAN_MODEL, messages, ttl=LLM_TTL_PLAN, on_text=on_text)
         
         now_kst = get_current_kst()
         result['generated_at'] = now_kst.strftime('%H:%M')
         result['generated_hours_left'] = 24 - now_kst.hour
         
         return result
-    except:
+    except Exception as e:
+        print(f"Error generating action plan: {e}")
         now_kst = get_current_kst()
         return {
             "current_analysis": "분석 중...", 
             "next_actions": "데이터 대기 중...", 
             "warnings": "",
             "generated_at": now_kst.strftime('%H:%M'),
-            "generated_hours_left": 24 - now_kst.hour
+            "generated_hours_left": 24 - now_kst.hour,
+            "error": True
         }
 
-def ai_generate_action_plan(hrv, rhr, weight, full_context, today_activities):
-    return ai_generate_action_plan_cached(hrv, rhr, weight, normalize_context_for_cache(full_context), tuple(today_activities))
+# ==========================================
+# [Action Plan 신선도] 프롬프트 문자열 대신 의미 있는 입력의 지문으로 재생성 여부 결정
+# - 지문: 마지막 Action_Log 행, 최신 생체 지표 행, 캘린더 이벤트 id, 프롬프트 시간대, Daily Five 상태
+# - 지문이 그대로면 TTL 없이 마지막 플랜 재사용, 바뀐 항목은 재생성 이유로 기록 (로컬 DB라 재시작 후에도 유지)
+# ==========================================
+PLAN_FINGERPRINT_LABELS = {
+    "log": "새 기록", "vitals": "생체 지표", "calendar": "캘린더", "time_bucket": "시간대", "daily_five": "Daily Five",
+}
+PLAN_STATE_KEEP_DAYS = 7
 
-def ai_parse_log(category, user_text, log_time, ref_data=""):
-    """카테고리별 AI 파싱 (확장된 카테고리 지원)"""
-    client = OpenAI(api_key=OPENAI_API_KEY)
-    
-    MY_SUPPLEMENTS = {
-        "마그네슘": "마그네슘 135mg",
-        "밀크시슬": "SAT 실리빈 150mg+아티초크 150mg+커큐민 150mg",
-        "락토핏": "유산균 20억 CFU + 아연 2.55mg",
-        "오메가3": "EPA+DHA 1000mg + 비타민E 11mg",
-        "비타민D3": "비타민D 100µg"
+def _short_hash(text):
+    return hashlib.sha1(str(text).encode("utf-8")).hexdigest()[:12]
+
+def build_plan_fingerprint(data_ctx, cal_evts, now_kst):
+    """Daily Five를 뺀 플랜 입력 지문 (JSON 왕복해도 같은 값이 되도록 문자열/리스트만 사용)"""
+    df_a, df_h = data_ctx.action, data_ctx.health
+    if df_a.empty:
+        last_log = "0"
+    else:
+        last = df_a.iloc[-1]
+        last_log = f"{len(df_a)}:" + _short_hash("|".join(str(last.get(c, "")) for c in ("Date", "Action_Time", "Category", "User_Input")))
+    vitals = [str(df_h.iloc[-1].get(c, "")) for c in ("Date", "HRV", "RHR", "Weight")] if not df_h.empty else []
+    return {
+        "log": last_log,
+        "vitals": vitals,
+        "calendar": sorted(str(e.get("id") or f"{e['time']} {e['title']}") for events in cal_evts.values() for e in events),
+        "time_bucket": describe_time_of_day(now_kst.hour)[0],
+    }
+
+def plan_change_reasons(old_fingerprint, new_fingerprint):
+    if old_fingerprint is None:
+        return ["오늘 첫 플랜"]
+    return [PLAN_FINGERPRINT_LABELS.get(k, k) for k in new_fingerprint if old_fingerprint.get(k) != new_fingerprint[k]]
+
+def load_latest_plan(date_key):
+    conn = open_local_db()
+    try:
+        row = conn.execute(
+            "SELECT fingerprint_json, result_json FROM plan_state WHERE date_key = ? ORDER BY id DESC LIMIT 1", (date_key,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return {"fingerprint": json.loads(row[0]), "result": json.loads(row[1])} if row else None
+
+def save_plan_state(date_key, fingerprint, result, reasons):
+    conn = open_local_db()
+    try:
+        now = time.time()
+        conn.execute(
+            "INSERT INTO plan_state (date_key, fingerprint_json, result_json, reasons_json, created_at) VALUES (?, ?, ?, ?, ?)",
+            (date_key, json.dumps(fingerprint, ensure_ascii=False), json.dumps(result, ensure_ascii=False), json.dumps(reasons, ensure_ascii=False), now)
+        )
+        conn.execute("DELETE FROM plan_state WHERE created_at < ?", (now - PLAN_STATE_KEEP_DAYS * 86400,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def load_plan_history(date_key):
+    """date_key의 재생성 기록 [(시각, 이유 리스트)] (최신순)"""
+    conn = open_local_db()
+    try:
+        rows = conn.execute(
+            "SELECT created_at, reasons_json FROM plan_state WHERE date_key = ? ORDER BY id DESC", (date_key,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [(datetime.fromtimestamp(r[0], KST).strftime("%H:%M:%S"), json.loads(r[1])) for r in rows]
+
+def get_or_create_action_plan(date_key, fingerprint, plan_args, dailyfive_txt="Daily Five: None", on_partial=None):
+    """
+    지문이 마지막 플랜과 같으면 그대로, 다르면 재생성 후 이유와 함께 저장 (동시 요청은 1회만 생성)
+    on_partial: 재생성할 때 스트리밍으로 부분 결과를 받을 콜백
+    """
+    def _load():
+        latest = load_latest_plan(date_key)
+        return latest["result"] if latest and latest["fingerprint"] == fingerprint else None
+
+    def _create():
+        latest = load_latest_plan(date_key)
+        reasons = plan_change_reasons(latest["fingerprint"] if latest else None, fingerprint)
+        hrv, rhr, weight, full_context, today_activities, training_facts = plan_args
+        result = ai_generate_action_plan_internal(hrv, rhr, weight, list(today_activities), full_context, dailyfive_txt, on_partial, training_facts)
+        if not result.get("error"):
+            result["regen_reasons"] = reasons
+            save_plan_state(date_key, fingerprint, result, reasons)
+        return result
+
+    return single_flight("plan", date_key, _load, _create)
+
+# ==========================================
+# [규칙 기반 빠른 파싱] 영양제/음주/회복의 정형 입력은 LLM 없이 즉시 파싱
+# - ai_parse_log와 같은 JSON 모양을 만든다
+# - 인식 못한 단어가 남으면 None → LLM으로 넘김 (확신할 때만 규칙 사용)
+# ==========================================
+MY_SUPPLEMENTS = {
+    "마그네슘": "마그네슘 135mg",
+    "밀크시슬": "SAT 실리빈 150mg+아티초크 150mg+커큐민 150mg",
+    "락토핏": "유산균 20억 CFU + 아연 2.55mg",
+    "오메가3": "EPA+DHA 1000mg + 비타민E 11mg",
+    "비타민D3": "비타민D 100µg"
+}
+SUPPLEMENT_ALIASES = {
+    "마그네슘": ["마그네슘"],
+    "밀크시슬": ["밀크시슬", "SAT"],
+    "락토핏": ["락토핏", "유산균"],
+    "오메가3": ["오메가3", "오메가 3", "오메가"],
+    "비타민D3": ["비타민D3", "비타민 D3", "비타민D", "비타민 D", "D3"],
+}
+ALCOHOL_DRINKS_PER_UNIT = {  # [Conversion] 소주 1병=7잔, 맥주 1캔=1.5잔, 와인 1병=5잔
+    "소주": {"병": 7, "잔": 1},
+    "맥주": {"캔": 1.5, "잔": 1},
+    "와인": {"병": 5, "잔": 1},
+}
+ALCOHOL_KCAL_PER_DRINK = {"소주": 57, "맥주": 100, "와인": 120}  # 1잔 기준. LLM 파싱 프롬프트도 같은 값을 쓴다
+SAUNA_CYCLE_MIN = 20  # 사우나10분+샤워2분+냉탕3분+휴식5분
+RECOVERY_ACTIVITIES = {"사우나": "sauna", "명상": "meditation", "마사지": "massage"}
+KOREAN_COUNTS = {"한": 1, "두": 2, "세": 3, "네": 4, "다섯": 5, "반": 0.5}
+FAST_PARSE_FILLER = re.compile(
+    r"(복용|먹음|먹었음|챙김|마심|마셨음|했음|함|완료|아침|점심|저녁|취침\s*전|식후|각|씩|\d+\s*(정|알|캡슐)|[,.+&/·~]|와|과|및|하고|\s)+"
+)
+_COUNT = r"(\d+(?:\.\d+)?|한|두|세|네|다섯|반)"
+
+@st.cache_resource
+def get_fast_parse_stats():
+    """rule: 규칙/로컬 인덱스로 파싱된 기록 수, llm: LLM으로 파싱한 기록 수 (기록당 1번씩, LLM 호출 지점에서 셈)"""
+    return {"lock": threading.Lock(), "rule": 0, "llm": 0}
+
+def count_fast_parse(key, n=1):
+    stats = get_fast_parse_stats()
+    with stats["lock"]:
+        stats[key] += n
+
+def _to_count(token):
+    return KOREAN_COUNTS[token] if token in KOREAN_COUNTS else float(token)
+
+def _is_fully_consumed(text, spans):
+    """매칭된 부분을 지운 뒤 채움말(복용/마심/구분자 등)만 남았는지"""
+    rest = text
+    for start, end in sorted(spans, reverse=True):
+        rest = rest[:start] + " " + rest[end:]
+    return FAST_PARSE_FILLER.sub("", rest) == ""
+
+def _fast_parse_supplements(text):
+    names, spans = [], []
+    for name, aliases in SUPPLEMENT_ALIASES.items():
+        for alias in sorted(aliases, key=len, reverse=True):
+            m = re.search(re.escape(alias), text, re.IGNORECASE)
+            if m and not any(m.start() < e and s < m.end() for s, e in spans):
+                names.append(name)
+                spans.append(m.span())
+                break
+    if not names or not _is_fully_consumed(text, spans):
+        return None
+    details = "\n".join(MY_SUPPLEMENTS[n] for n in names)
+    return {
+        "supplements": names,
+        "count": len(names),
+        "details": details,
+        "summary": f"영양제 {len(names)}종 복용 ({', '.join(MY_SUPPLEMENTS[n] for n in names)})",
+    }
+
+def _fast_parse_alcohol(text):
+    pattern = rf"({'|'.join(ALCOHOL_DRINKS_PER_UNIT)})\s*{_COUNT}\s*(병|캔|잔)"
+    items, spans = [], []
+    for m in re.finditer(pattern, text):
+        kind, count, unit = m.group(1), _to_count(m.group(2)), m.group(3)
+        if unit not in ALCOHOL_DRINKS_PER_UNIT[kind] or count <= 0:
+            return None  # 예: 맥주 1병(용량 제각각), 소주 0병 → LLM
+        items.append((kind, count, unit, count * ALCOHOL_DRINKS_PER_UNIT[kind][unit]))
+        spans.append(m.span())
+    if not items or not _is_fully_consumed(text, spans):
+        return None
+    drinks = sum(i[3] for i in items)
+    kcal = round(sum(i[3] * ALCOHOL_KCAL_PER_DRINK[i[0]] for i in items))
+    label = " + ".join(f"{k} {c:g}{u}" for k, c, u, _ in items)
+    return {
+        "alcohol_type": "/".join(dict.fromkeys(i[0] for i in items)),
+        "standard_drinks": int(drinks + 0.5),
+        "calories": kcal,
+        "summary": f"{label} ({drinks:g}잔, {kcal}kcal)",
     }
 
+def _fast_parse_recovery(text):
+    pattern = rf"({'|'.join(RECOVERY_ACTIVITIES)})\s*(?:{_COUNT}\s*(세트|사이클|회|번)|(\d+)\s*분)"
+    m = re.fullmatch(rf"\s*{pattern}\s*(했음|함|완료)?\s*", text)
+    if not m:
+        return None
+    name, count, _, minutes = m.group(1), m.group(2), m.group(3), m.group(4)
+    activity = RECOVERY_ACTIVITIES[name]
+    if count is not None:
+        if activity != "sauna":
+            return None  # 명상 2회 등은 시간 정보가 없음 → LLM
+        cycles = int(_to_count(count)) if float(_to_count(count)).is_integer() else None
+        if not cycles:
+            return None
+        duration = cycles * SAUNA_CYCLE_MIN
+    else:
+        duration = int(minutes)
+        if duration <= 0:
+            return None
+        cycles = max(1, round(duration / SAUNA_CYCLE_MIN)) if activity == "sauna" else 0
+    summary = f"사우나 {cycles}사이클 ({duration}분)" if activity == "sauna" else f"{name} {duration}분"
+    return {"activity_type": activity, "cycles": cycles, "duration": duration, "summary": summary}
+
+def fast_parse_log(category, user_text):
+    """규칙/로컬 인덱스로 확실히 파싱되는 입력만 결과 dict, 아니면 None (지원 안 하는 카테고리 포함)"""
+    if "영양제" in category:
+        parser = _fast_parse_supplements
+    elif "섭취" in category:
+        parser = lookup_food
+    elif "음주" in category:
+        parser = _fast_parse_alcohol
+    elif "회복" in category:
+        parser = _fast_parse_recovery
+    else:
+        return None
+    try:
+        parsed = parser(str(user_text).strip())
+    except (ValueError, KeyError):
+        parsed = None
+    if parsed:
+        count_fast_parse("rule")
+    return parsed
+
+# ==========================================
+# [로컬 음식 인덱스] 섭취 기록은 표준 1인분 표 + 과거 파싱 결과 메모에서 먼저 찾는다
+# - 문자 2-gram Dice 유사도로 퍼지 매칭, FOOD_MATCH_THRESHOLD 이상일 때만 사용
+# - "A, B" 처럼 여러 음식은 전부 매칭될 때만 합산, 끝의 수량(2개, 1.5인분)은 배수로 반영
+# - 처음 보는 음식은 LLM 결과를 인덱스에 학습 (source: standard / log / llm)
+# ==========================================
+FOOD_MATCH_THRESHOLD = 0.8
+STANDARD_FOODS = {  # 표준 1인분: (kcal, 탄, 단, 지)
+    "공기밥": (310, 68, 6, 1), "현미밥": (300, 64, 7, 2), "김치찌개": (250, 12, 18, 14),
+    "된장찌개": (180, 14, 13, 8), "미역국": (120, 5, 9, 7), "제육볶음": (480, 20, 30, 30),
+    "불고기": (400, 15, 30, 24), "비빔밥": (600, 95, 20, 15), "김밥": (450, 70, 13, 12),
+    "라면": (500, 79, 10, 16), "짜장면": (800, 125, 20, 23), "짬뽕": (690, 100, 30, 18),
+    "칼국수": (600, 100, 20, 10), "물냉면": (550, 100, 18, 6), "떡볶이": (480, 95, 10, 6),
+    "순대국밥": (650, 60, 35, 28), "돼지국밥": (600, 60, 35, 25), "돈까스": (700, 60, 30, 38),
+    "삼겹살": (660, 0, 34, 57), "햄버거": (550, 45, 25, 28), "피자": (280, 30, 12, 12),
+    "토스트": (350, 40, 10, 16), "닭가슴살": (110, 0, 23, 1), "닭가슴살샐러드": (250, 12, 28, 9),
+    "샐러드": (150, 10, 4, 10), "삶은계란": (75, 1, 6, 5), "두부": (120, 3, 13, 7),
+    "고구마": (200, 47, 2, 0), "바나나": (95, 24, 1, 0), "사과": (130, 34, 1, 0),
+    "그릭요거트": (130, 8, 12, 5), "오트밀": (150, 27, 5, 3), "우유": (130, 10, 6, 7),
+    "프로틴쉐이크": (120, 3, 24, 1), "아메리카노": (10, 2, 0, 0), "카페라떼": (190, 15, 10, 10),
+}
+FOOD_FILLER = re.compile(r"(먹음|먹었음|섭취|식사|드심)")
+FOOD_SPLIT = re.compile(r"[,+/&\n]|\s+(?:와|과|및|하고|그리고)\s+")
+FOOD_QUANTITY = re.compile(rf"{_COUNT}\s*(개|인분|그릇|공기|줄|조각|잔|스쿱|접시|모)\s*$")
+_MACRO_PATTERNS = [re.compile(rf"{k}\D*?(\d+(?:\.\d+)?)") for k in ("탄", "단", "지")]
+
+def normalize_food_text(text):
+    return re.sub(r"[^0-9a-z가-힣]", "", FOOD_FILLER.sub("", str(text).lower()))
+
+def food_ngrams(key, n=2):
+    return {key[i:i + n] for i in range(len(key) - n + 1)} if len(key) >= n else {key}
+
+def parse_macros(macros):
+    """"탄:xx 단:xx 지:xx" → (탄, 단, 지) 숫자 튜플, 못 읽으면 None"""
+    vals = [p.search(str(macros)) for p in _MACRO_PATTERNS]
+    return tuple(float(v.group(1)) for v in vals) if all(vals) else None
+
+def format_macros(values):
+    return "탄:{:.0f} 단:{:.0f} 지:{:.0f}".format(*values)
+
+def _food_rows_from_mirror(conn):
+    """미러의 Action_Log에서 과거 섭취 파싱 결과 (정규화 입력 → 결과). 같은 입력은 최근 것이 우선"""
+    meta = conn.execute("SELECT header_json FROM mirror_meta WHERE worksheet = 'Action_Log'").fetchone()
+    if not meta:
+        return {}
+    header = json.loads(meta[0])
+    if not {"Category", "User_Input", AI_JSON_COLUMN} <= set(header):
+        return {}
+    i_cat, i_text, i_ai = header.index("Category"), header.index("User_Input"), header.index(AI_JSON_COLUMN)
+    memo = {}
+    for (row_json,) in conn.execute("SELECT row_json FROM mirror_rows WHERE worksheet = 'Action_Log' ORDER BY row_idx"):
+        row = json.loads(row_json)
+        if len(row) <= max(i_cat, i_text, i_ai) or "섭취" not in str(row[i_cat]):
+            continue
+        try:
+            js = json.loads(row[i_ai])
+            calories = float(js.get("calories") or 0)
+        except (ValueError, TypeError, AttributeError):
+            continue
+        key = normalize_food_text(row[i_text])
+        if key and calories > 0 and "error" not in js:
+            memo[key] = (str(js.get("food_name") or row[i_text]), calories, str(js.get("macros") or ""), str(js.get("summary") or ""))
+    return memo
+
+def load_food_index(index):
+    """표준 표와 미러 메모를 SQLite에 반영하고 메모리 인덱스를 다시 만든다. 항목 수 반환"""
+    conn = open_local_db()
+    try:
+        now = time.time()
+        conn.executemany(
+            "INSERT OR IGNORE INTO food_index (name_key, food_name, calories, macros, source, updated_at) VALUES (?, ?, ?, ?, 'standard', ?)",
+            [(normalize_food_text(name), name, v[0], format_macros(v[1:]), now) for name, v in STANDARD_FOODS.items()]
+        )
+        conn.executemany(
+            "INSERT OR IGNORE INTO food_index (name_key, food_name, calories, macros, summary, source, updated_at) VALUES (?, ?, ?, ?, ?, 'log', ?)",
+            [(key, *v, now) for key, v in _food_rows_from_mirror(conn).items()]
+        )
+        conn.commit()
+        rows = conn.execute("SELECT name_key, food_name, calories, macros, summary, source FROM food_index").fetchall()
+    finally:
+        conn.close()
+    with index["lock"]:
+        index["entries"] = {r[0]: {"food_name": r[1], "calories": r[2], "macros": r[3], "summary": r[4], "source": r[5]} for r in rows}
+        index["grams"] = {key: food_ngrams(key) for key in index["entries"]}
+    return len(rows)
+
+@st.cache_resource
+def get_food_index():
+    index = {"lock": threading.Lock(), "entries": {}, "grams": {}, "matched": 0, "learned": 0}
+    try:
+        load_food_index(index)
+    except sqlite3.Error as e:
+        print(f"⚠️ Food index load error: {e}")
+    return index
+
+def _best_food_match(index, key):
+    with index["lock"]:
+        if key in index["entries"]:
+            return index["entries"][key]
+        grams, digits = food_ngrams(key), re.sub(r"\D", "", key)
+        best, best_score = None, 0.0
+        for other, other_grams in index["grams"].items():
+            if re.sub(r"\D", "", other) != digits:
+                continue  # "공기밥 2", "삼겹살 300g" 같은 수량 차이는 퍼지로 흡수하지 않음
+            score = 2 * len(grams & other_grams) / (len(grams) + len(other_grams))
+            if score > best_score:
+                best, best_score = other, score
+        return index["entries"][best] if best_score >= FOOD_MATCH_THRESHOLD else None
+
+def _match_food_part(index, part):
+    """음식 1개 → (항목, 배수). 확실하지 않으면 None"""
+    part = FOOD_FILLER.sub("", part).strip()
+    entry = _best_food_match(index, normalize_food_text(part)) if normalize_food_text(part) else None
+    if entry:
+        return entry, 1
+    m = FOOD_QUANTITY.search(part)
+    if not m or not normalize_food_text(part[:m.start()]):
+        return None
+    entry = _best_food_match(index, normalize_food_text(part[:m.start()]))
+    return (entry, _to_count(m.group(1))) if entry else None
+
+def lookup_food(user_text):
+    """섭취 입력을 인덱스에서 찾아 ai_parse_log 섭취 JSON 모양으로. 하나라도 못 찾으면 None"""
+    index = get_food_index()
+    parts = [p for p in FOOD_SPLIT.split(str(user_text)) if p and p.strip()]
+    matches = [_match_food_part(index, p) for p in parts]
+    if not matches or any(m is None for m in matches):
+        return None
+
+    if len(matches) == 1 and matches[0][1] == 1:
+        entry = matches[0][0]
+        result = {
+            "calories": int(round(entry["calories"])), "food_name": entry["food_name"],
+            "macros": entry["macros"], "summary": entry["summary"] or f"{entry['food_name']} ({entry['calories']:.0f}kcal)",
+        }
+    else:
+        calories = sum(e["calories"] * n for e, n in matches)
+        macros = [parse_macros(e["macros"]) for e, _ in matches]
+        food_name = " + ".join(e["food_name"] + (f" x{n:g}" if n != 1 else "") for e, n in matches)
+        result = {
+            "calories": int(round(calories)), "food_name": food_name,
+            "macros": format_macros([sum(m[i] * n for m, (_, n) in zip(macros, matches)) for i in range(3)]) if all(macros) else "",
+            "summary": f"{food_name} ({calories:.0f}kcal)",
+        }
+    with index["lock"]:
+        index["matched"] += 1
+    return result
+
+def learn_food(user_text, parsed):
+    """LLM 섭취 파싱 결과를 인덱스에 추가 (다음부터 같은/비슷한 입력은 로컬 처리)"""
+    key = normalize_food_text(user_text)
+    try:
+        calories = float(parsed.get("calories") or 0)
+    except (ValueError, TypeError):
+        return
+    if not key or calories <= 0 or "error" in parsed:
+        return
+    entry = {
+        "food_name": str(parsed.get("food_name") or user_text), "calories": calories,
+        "macros": str(parsed.get("macros") or ""), "summary": str(parsed.get("summary") or ""), "source": "llm",
+    }
+    conn = open_local_db()
+    try:
+        conn.execute(
+            "INSERT OR REPLACE INTO food_index (name_key, food_name, calories, macros, summary, source, updated_at) VALUES (?, ?, ?, ?, ?, 'llm', ?)",
+            (key, entry["food_name"], calories, entry["macros"], entry["summary"], time.time())
+        )
+        conn.commit()
+    finally:
+        conn.close()
+    index = get_food_index()
+    with index["lock"]:
+        index["entries"][key] = entry
+        index["grams"][key] = food_ngrams(key)
+        index["learned"] += 1
+
+def parse_log_role(category, user_text):
+    """카테고리별 파싱 지시문 + 출력 JSON 스키마"""
     if "영양제" in category:
         matched_info = []
         for name, detail in MY_SUPPLEMENTS.items():
@@ -965,27 +2904,31 @@ def ai_parse_log(category, user_text, log_time, ref_data=""):
         """
     
     elif "음주" in category:
-        system_role = """
+        conversion = ", ".join(f"{k} 1{u}={n:g}잔" for k, units in ALCOHOL_DRINKS_PER_UNIT.items() for u, n in units.items() if u != "잔")
+        kcal = ", ".join(f"{k} 1잔={v}kcal" for k, v in ALCOHOL_KCAL_PER_DRINK.items())
+        example_drinks = 2 * ALCOHOL_DRINKS_PER_UNIT["소주"]["병"]
+        system_role = f"""
         Alcohol consumption tracker.
-        [Conversion] 소주 1병=7잔, 맥주 1캔=1.5잔, 와인 1병=5잔
-        Output JSON: {
+        [Conversion] {conversion}
+        [Calories] {kcal}
+        Output JSON: {{
             "alcohol_type": "소주/맥주/와인",
             "standard_drinks": int,
             "calories": int,
-            "summary": "소주 2병 (14잔, 1400kcal)"
-        }
+            "summary": "소주 2병 ({example_drinks}잔, {round(example_drinks * ALCOHOL_KCAL_PER_DRINK['소주'])}kcal)"
+        }}
         """
     
     elif "회복" in category:
-        system_role = """
+        system_role = f"""
         Recovery activity tracker.
-        [Sauna] 1 cycle = 20분 (사우나10분+샤워2분+냉탕3분+휴식5분)
-        Output JSON: {
+        [Sauna] 1 cycle = {SAUNA_CYCLE_MIN}분 (사우나10분+샤워2분+냉탕3분+휴식5분)
+        Output JSON: {{
             "activity_type": "sauna/meditation/massage",
             "cycles": int (사우나만),
             "duration": int,
-            "summary": "사우나 2사이클 (36분)"
-        }
+            "summary": "사우나 2사이클 ({2 * SAUNA_CYCLE_MIN}분)"
+        }}
         """
     
     elif "노트" in category:
@@ -1000,67 +2943,545 @@ def ai_parse_log(category, user_text, log_time, ref_data=""):
     
     else: 
         system_role = "Health Logger. Output JSON with summary field."
+    return system_role
 
+def ai_parse_log(category, user_text, log_time, ref_data=""):
+    """카테고리별 AI 파싱 (확장된 카테고리 지원). 정형 입력은 fast_parse_log로 먼저 처리"""
+    return fast_parse_log(category, user_text) or _llm_parse_log(category, user_text, log_time)
+
+def _llm_parse_log(category, user_text, log_time):
+    system_role = parse_log_role(category, user_text)
     prompt = f"User logged [{category}] at [{log_time}]. Text: '{user_text}'. {system_role} Return ONLY JSON."
-    
+    count_fast_parse("llm")
+
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
-        return json.loads(response.choices[0].message.content)
+        parsed = llm_chat_json("gpt-4o-mini", [{"role": "user", "content": prompt}], ttl=LLM_TTL_PARSE, deadline=30.0)
+        if "섭취" in category:
+            try:
+                learn_food(user_text, parsed)
+            except sqlite3.Error as e:
+                print(f"⚠️ Food index learn error: {e}")
+        return parsed
     except Exception as e:
         return {"summary": user_text, "error": str(e)}
 
+def ai_parse_logs_batch(entries):
+    """
+    여러 기록을 LLM 1회로 파싱. entries: [(category, user_text, log_time)] → 같은 순서의 결과 dict 리스트
+    - 규칙/로컬 인덱스로 되는 항목은 먼저 처리, 나머지만 묶어서 요청
+    - 묶음 응답에서 빠진 항목은 개별 LLM 호출로 보충
+    """
+    results = [fast_parse_log(category, text) for category, text, _ in entries]
+    todo = [i for i, r in enumerate(results) if r is None]
+    if len(todo) == 1:
+        category, text, log_time = entries[todo[0]]
+        results[todo[0]] = _llm_parse_log(category, text, log_time)
+        return results
+    if not todo:
+        return results
+
+    roles = {}
+    for i in todo:
+        category, text, _ = entries[i]
+        roles.setdefault(category, []).append(text)
+    role_txt = "\n".join(f"[{category}] {parse_log_role(category, ' '.join(texts)).strip()}" for category, texts in roles.items())
+    lines = "\n".join(f"{i}. [{entries[i][0]}] at [{entries[i][2]}] Text: '{entries[i][1]}'" for i in todo)
+    prompt = f"""User logged multiple health entries. Parse EACH entry independently using the schema for its category.
+    [SCHEMAS BY CATEGORY]
+    {role_txt}
+
+    [ENTRIES]
+    {lines}
+
+    Output JSON: {{"results": [{{"id": <entry number>, "result": {{...schema for that category...}}}}]}}
+    Return ONLY JSON."""
+
+    try:
+        batch = llm_chat_json("gpt-4o-mini", [{"role": "user", "content": prompt}], ttl=LLM_TTL_PARSE, deadline=60.0)
+        by_id = {int(r["id"]): r["result"] for r in batch.get("results", []) if isinstance(r, dict) and isinstance(r.get("result"), dict)}
+    except Exception as e:
+        print(f"⚠️ Batch parse error ({len(todo)} entries): {e}")
+        by_id = {}
+    count_fast_parse("llm", sum(1 for i in todo if i in by_id))  # 빠진 항목은 _llm_parse_log에서 셈
+
+    for i in todo:
+        category, text, log_time = entries[i]
+        if i not in by_id:
+            results[i] = _llm_parse_log(category, text, log_time)
+            continue
+        results[i] = by_id[i]
+        if "섭취" in category:
+            try:
+                learn_food(text, by_id[i])
+            except sqlite3.Error as e:
+                print(f"⚠️ Food index learn error: {e}")
+    return results
+
+# ==========================================
+# [캘린더 캐시] 캘린더별 이벤트 저장소를 syncToken으로 증분 동기화하고 렌더는 메모리에서 읽기만 한다
+# - discovery 기반 서비스는 프로세스당 1번만 생성, API 호출은 calendar-sync 스레드에서만
+# - 410 Gone(토큰 만료) → 해당 캘린더 저장소를 비우고 전체 재동기화
+# - 저장소는 [오늘 - LOOKBACK, 오늘 + HORIZON) 창만 유지: 전체 동기화는 timeMin/timeMax로 제한하고,
+#   증분 변경 중 창 밖의 반복 일정 인스턴스 등은 버린다. 날짜가 바뀌면 창을 옮기기 위해 하루 1번 전체 재동기화
+# - 모든 캘린더의 요청을 BatchHttpRequest 1번(왕복 1회)으로 보낸다. 다음 페이지/410 재동기화만 개별 요청
+# - 며칠치 창(내일/모레 계획)도 같은 저장소에서 한 번에 잘라낸다
+# ==========================================
+CALENDAR_SCOPES = ['https://www.googleapis.com/auth/calendar.readonly']
+CALENDAR_REFRESH = 120       # 초: 백그라운드 증분 동기화 간격
+CALENDAR_LOOKBACK_DAYS = 1   # 저장소 창: 오늘 0시(KST) 기준 며칠 전부터
+CALENDAR_HORIZON_DAYS = 14   # 저장소 창: 오늘 0시(KST) 기준 며칠 후까지
+CALENDAR_COLD_WAIT = 5       # 초: 프로세스 시작 직후 첫 동기화를 렌더가 기다리는 최대 시간
+CALENDAR_BATCH_LIMIT = 50    # Calendar API 배치 1회당 최대 요청 수
+
+def parse_calendar_time(value):
+    """이벤트 start/end → (KST naive datetime, 종일 여부)"""
+    if 'dateTime' in value:
+        dt = datetime.fromisoformat(value['dateTime'].replace('Z', '+00:00'))
+        if dt.tzinfo is not None:
+            dt = dt.astimezone(KST).replace(tzinfo=None)
+        return dt, False
+    return datetime.fromisoformat(value['date']), True
+
+def normalize_calendar_event(item):
+    start, all_day = parse_calendar_time(item['start'])
+    end = parse_calendar_time(item['end'])[0] if 'end' in item else start
+    return {'id': item.get('id'), 'title': item.get('summary', 'No Title'), 'start': start, 'end': end, 'all_day': all_day}
+
+class CalendarCache:
+    """캘린더별 이벤트 저장소 {id: event} + syncToken. 저장소 dict는 통째로 교체하므로 읽기에 잠금이 필요 없다"""
+
+    def __init__(self):
+        self.service = None
+        self.stores = {name: {"events": {}, "sync_token": None, "full_sync_day": None} for name in CALENDAR_IDS}
+        self.wake = threading.Event()
+        self.cond = threading.Condition()
+        self.syncing = False
+        self.stats = {"syncs": 0, "full_syncs": 0, "incremental_syncs": 0, "resyncs_410": 0, "changes": 0,
+                      "batches": 0, "errors": 0, "last_error": None, "last_sync_at": None, "last_sync_ms": 0.0}
+
+    @staticmethod
+    def _window(today):
+        """저장소 창 (KST naive datetime 시작, 끝)"""
+        midnight = datetime.combine(today, datetime.min.time())
+        return midnight - timedelta(days=CALENDAR_LOOKBACK_DAYS), midnight + timedelta(days=CALENDAR_HORIZON_DAYS)
+
+    def _list_params(self, name, full, today):
+        params = {"calendarId": CALENDAR_IDS[name], "singleEvents": True, "maxResults": 2500}
+        if full:
+            window_start, window_end = self._window(today)
+            params["timeMin"] = window_start.replace(tzinfo=KST).isoformat()
+            params["timeMax"] = window_end.replace(tzinfo=KST).isoformat()
+        else:
+            params["syncToken"] = self.stores[name]["sync_token"]
+        return params
+
+    def _collect(self, params, resp):
+        """첫 페이지 응답 + 나머지 페이지 → (items, nextSyncToken)"""
+        items = list(resp.get('items', []))
+        while resp.get('nextPageToken'):
+            resp = self.service.events().list(pageToken=resp['nextPageToken'], **params).execute()
+            items.extend(resp.get('items', []))
+        return items, resp.get('nextSyncToken')
+
+    def _apply(self, name, full, items, token, today):
+        store = self.stores[name]
+        events = {} if full else dict(store["events"])
+        window_start, window_end = self._window(today if full else store["full_sync_day"])
+        for item in items:
+            event = normalize_calendar_event(item) if item.get('status') != 'cancelled' and 'start' in item else None
+            if event is None or event['start'] >= window_end or event['end'] <= window_start:
+                events.pop(item.get('id'), None)
+            else:
+                events[item['id']] = event
+        self.stats["changes"] += len(items)
+        self.stats["full_syncs" if full else "incremental_syncs"] += 1
+        self.stores[name] = {"events": events, "sync_token": token, "full_sync_day": today if full else store["full_sync_day"]}
+
+    def _sync_batch(self, names, today):
+        plans = {}
+        for name in names:
+            store = self.stores[name]
+            full = store["sync_token"] is None or store["full_sync_day"] != today
+            plans[name] = (full, self._list_params(name, full, today))
+
+        responses, errors = {}, {}
+
+        def _on_response(request_id, response, exception):
+            if exception is None:
+                responses[request_id] = response
+            else:
+                errors[request_id] = exception
+
+        batch = self.service.new_batch_http_request(callback=_on_response)
+        for name, (_, params) in plans.items():
+            batch.add(self.service.events().list(**params), request_id=name)
+        batch.execute()
+        self.stats["batches"] += 1
+
+        for name, (full, params) in plans.items():
+            try:
+                if name in errors:
+                    e = errors[name]
+                    if full or not (isinstance(e, HttpError) and e.resp.status == 410):
+                        raise e
+                    # 토큰 만료: 이 캘린더만 저장소를 비우고 전체 재동기화
+                    self.stats["resyncs_410"] += 1
+                    full, params = True, self._list_params(name, True, today)
+                    resp = self.service.events().list(**params).execute()
+                else:
+                    resp = responses[name]
+                items, token = self._collect(params, resp)
+                self._apply(name, full, items, token, today)
+            except Exception as e:
+                # 실패한 캘린더는 이전 저장소를 그대로 서빙
+                self.stats["errors"] += 1
+                self.stats["last_error"] = f"{name}: {e}"
+                print(f"⚠️ Calendar sync error ({name}): {e}")
+
+    def sync_all(self):
+        started = time.perf_counter()
+        with self.cond:
+            self.syncing = True
+        try:
+            if self.service is None:
+                self.service = build('calendar', 'v3', credentials=load_google_credentials(CALENDAR_SCOPES), cache_discovery=False)
+            today = get_current_kst().date()
+            names = list(CALENDAR_IDS)
+            for i in range(0, len(names), CALENDAR_BATCH_LIMIT):
+                self._sync_batch(names[i:i + CALENDAR_BATCH_LIMIT], today)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = str(e)
+            print(f"⚠️ Calendar service error: {e}")
+        finally:
+            self.stats["last_sync_ms"] = (time.perf_counter() - started) * 1000
+            self.stats["last_sync_at"] = time.time()
+            with self.cond:
+                self.syncing = False
+                self.stats["syncs"] += 1
+                self.cond.notify_all()
+
+    def run(self):
+        while True:
+            self.sync_all()
+            self.wake.wait(timeout=CALENDAR_REFRESH)
+            self.wake.clear()
+
+    def wait_for_sync(self, min_syncs, timeout):
+        with self.cond:
+            return self.cond.wait_for(lambda: self.stats["syncs"] >= min_syncs, timeout=timeout)
+
+    def refresh(self, timeout=None):
+        """즉시 동기화 요청. timeout이 있으면 요청 이후 시작된 동기화가 끝날 때까지 대기"""
+        with self.cond:
+            target = self.stats["syncs"] + (2 if self.syncing else 1)
+        self.wake.set()
+        if timeout:
+            return self.wait_for_sync(target, timeout)
+        return True
+
+    def events_window(self, start_day, days):
+        """start_day(date)부터 days일 동안 날짜별 이벤트 {date: {캘린더 이름: [{'id', 'title', 'time'}]}} (시작 시각 순)"""
+        window_start = datetime.combine(start_day, datetime.min.time())
+        day_starts = [window_start + timedelta(days=d) for d in range(days)]
+        window = {d.date(): {name: [] for name in CALENDAR_IDS} for d in day_starts}
+        for name in CALENDAR_IDS:
+            events = sorted(self.stores[name]["events"].values(), key=lambda e: (not e['all_day'], e['start']))
+            for e in events:
+                for day_start in day_starts:
+                    day_end = day_start + timedelta(days=1)
+                    if e['start'] < day_end and (e['end'] > day_start or e['start'] >= day_start):
+                        window[day_start.date()][name].append({'id': e['id'], 'title': e['title'], 'time': "종일" if e['all_day'] else e['start'].strftime('%H:%M')})
+        return window
+
+@st.cache_resource
+def get_calendar_cache():
+    cache = CalendarCache()
+    threading.Thread(target=cache.run, name="calendar-sync", daemon=True).start()
+    return cache
+
+def get_calendar_events_window(start_day, days):
+    cache = get_calendar_cache()
+    if cache.stats["syncs"] == 0:
+        cache.wait_for_sync(1, CALENDAR_COLD_WAIT)
+    return cache.events_window(start_day, days)
+
+def get_calendar_events_for_day(day):
+    return get_calendar_events_window(day, 1)[day]
+
 def get_today_calendar_events():
+    return get_calendar_events_for_day(get_current_kst().date())
+
+# ==========================================
+# [대시보드 생성 오케스트레이션]
+# 체크인 / Daily Five / Action Plan을 스레드 풀에서 동시에 시작하고,
+# 대시보드는 끝나는 순서대로 각 섹션을 렌더한다.
+# ==========================================
+GENERATION_WORKERS = 6
+
+@st.cache_resource
+def get_generation_pool():
+    return ThreadPoolExecutor(max_workers=GENERATION_WORKERS, thread_name_prefix="dashboard-gen")
+
+def submit_with_script_ctx(fn, *args, **kwargs):
+    """현재 스크립트 실행 컨텍스트를 붙여서 풀에 제출 (워커 스레드에서도 st.cache_* 사용 가능)"""
+    ctx = get_script_run_ctx()
+
+    def _run():
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+
+    return get_generation_pool().submit(_run)
+
+# 같은 날짜의 체크인/Daily Five를 여러 세션이 동시에 요청해도 LLM 호출은 1번만
+SINGLE_FLIGHT_WAIT = 180  # 초: 앞선 생성이 이보다 오래 걸리면 기다리지 않고 직접 생성
+
+@st.cache_resource
+def get_single_flight_state():
+    return {"lock": threading.Lock(), "keys": {}, "led": 0, "joined": 0, "timeouts": 0}
+
+@contextmanager
+def _flight_file_lock(path, timeout):
+    """fcntl 잠금 파일로 프로세스 간 직렬화. 잠금을 얻으면 True, 시간 초과/미지원이면 False"""
+    if fcntl is None:
+        yield False
+        return
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(path, "a") as f:
+        deadline = time.monotonic() + timeout
+        acquired = False
+        while True:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                acquired = True
+                break
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    break
+                time.sleep(0.2)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+def single_flight(generator, key, load, create):
+    """
+    (generator, key)별 생성은 한 번에 하나만 실행하고, 나머지 호출자는 끝날 때까지 기다렸다가 저장된 결과를 읽는다
+    load(): 저장된 결과 (없으면 None) / create(): 생성 + 저장 후 결과 반환
+    """
+    result = load()
+    if result:
+        return result
+
+    state = get_single_flight_state()
+    with state["lock"]:
+        key_lock = state["keys"].setdefault((generator, key), threading.Lock())
+    got_thread_lock = key_lock.acquire(timeout=SINGLE_FLIGHT_WAIT)
     try:
-        creds = service_account.Credentials.from_json_keyfile_dict(st.secrets["gcp_service_account"], ['https://www.googleapis.com/auth/calendar.readonly']) if "gcp_service_account" in st.secrets else service_account.Credentials.from_service_account_file('service_account.json', ['https://www.googleapis.com/auth/calendar.readonly'])
-        service = build('calendar', 'v3', credentials=creds)
-        now = get_current_kst()
-        t_min = (now.replace(hour=0,minute=0,second=0)-timedelta(hours=9)).isoformat()+'Z'
-        t_max = (now.replace(hour=0,minute=0,second=0)+timedelta(days=1)-timedelta(hours=9)).isoformat()+'Z'
-        evts = {"Sports":[], "Termin":[]}
-        for name, cid in CALENDAR_IDS.items():
-            items = service.events().list(calendarId=cid, timeMin=t_min, timeMax=t_max, singleEvents=True, orderBy='startTime').execute().get('items', [])
-            for i in items:
-                start = i['start'].get('dateTime', i['start'].get('date'))
-                t = (datetime.fromisoformat(start.replace('Z','+00:00'))+timedelta(hours=9)).strftime('%H:%M')
-                evts[name].append({'title':i.get('summary','No Title'), 'time':t})
-        return evts
-    except: return {"Sports":[], "Termin":[]}
+        lock_path = os.path.join(CACHE_DIR, f"flight_{generator}_{key}.lock")
+        with _flight_file_lock(lock_path, SINGLE_FLIGHT_WAIT if got_thread_lock else 0):
+            result = load()  # 기다리는 동안 다른 세션/프로세스가 만들었을 수 있음
+            if result:
+                with state["lock"]:
+                    state["joined"] += 1
+                return result
+            with state["lock"]:
+                state["led"] += 1
+                if not got_thread_lock:
+                    state["timeouts"] += 1
+            return create()
+    finally:
+        if got_thread_lock:
+            key_lock.release()
+
+def get_or_create_checkin(date_key, hrv, rhr, weight, morning_context, calendar_str):
+    """date_key별 체크인: 파일 캐시 있으면 그대로, 없으면 생성 후 저장 (동시 요청은 1회만 생성)"""
+    def _create():
+        ck_res = ai_generate_daily_checkin(date_key, hrv, rhr, weight, morning_context, calendar_str)
+        if ck_res.get("error"):
+            ai_generate_daily_checkin.clear()  # 실패 결과는 어떤 캐시에도 고정하지 않음 (다음 호출에서 재시도)
+            return ck_res
+        ck_res["generated_at_kst"] = get_current_kst().strftime("%Y-%m-%d %H:%M:%S")
+        ck_res["date_key"] = date_key  # 기준일도 명시적으로 남김
+        save_checkin_cache(date_key, ck_res)
+        clear_old_caches()
+        return ck_res
+
+    return single_flight("checkin", date_key, lambda: load_checkin_cache(date_key), _create)
+
+def get_or_create_daily_five(date_key, sprint, current_status, context):
+    """date_key + sprint별 Daily Five: 파일 캐시 있으면 그대로, 없으면 생성 후 저장 (동시 요청은 1회만 생성)"""
+    sprint_id = sprint['sprint_id']
+
+    def _create():
+        five = ai_generate_daily_five(date_key, sprint, current_status, context)
+        if five:
+            save_dailyfive_cache(date_key, sprint_id, five)
+            clear_old_caches()
+        else:
+            ai_generate_daily_five.clear()  # 실패(None)가 st.cache_data에 남으면 재시도가 바로 None을 받는다
+        return five
+
+    return single_flight("dailyfive", f"{date_key}_{sprint_id}", lambda: load_dailyfive_cache(date_key, sprint_id), _create)
+
+def start_dashboard_generations(data_ctx, date_key, m_row, m_ctx, cal_txt, plan_args, plan_fingerprint, on_plan_partial=None):
+    """
+    대시보드용 LLM 생성 작업을 동시에 시작. {"checkin"|"daily_five"|"plan": Future}
+    - 체크인, Daily Five: 아침 기록(m_row)이 있을 때만
+    - Action Plan: Daily Five 체크리스트를 프롬프트에 넣으므로, Daily Five를 새로 만드는 중이면 그것만 기다린다
+    """
+    futures = {}
+    five_future = None
+    if m_row is not None:
+        status = {'weight': float(m_row['Weight']), 'hrv': float(m_row['HRV']), 'rhr': float(m_row['RHR'])}
+        futures["checkin"] = submit_with_script_ctx(
+            get_or_create_checkin, date_key, status['hrv'], status['rhr'], status['weight'], m_ctx, cal_txt
+        )
+        sprint = get_active_sprint()
+        if sprint:
+            five_ctx = {'calendar': cal_txt, 'training_facts': format_training_facts(get_training_stats(data_ctx, date_key, include_today=False))}
+            five_future = submit_with_script_ctx(get_or_create_daily_five, date_key, sprint, status, five_ctx)
+            futures["daily_five"] = five_future
+
+    def _plan():
+        dailyfive_txt = "Daily Five: None"
+        try:
+            if five_future is not None:
+                five_future.result()
+            sprint = get_active_sprint()
+            if sprint:
+                dailyfive_txt = build_dailyfive_status_text(date_key, sprint['sprint_id'], data_ctx)
+        except Exception:
+            pass
+        fingerprint = {**plan_fingerprint, "daily_five": _short_hash(dailyfive_txt)}
+        return get_or_create_action_plan(date_key, fingerprint, plan_args, dailyfive_txt, on_partial=on_plan_partial)
+
+    futures["plan"] = submit_with_script_ctx(_plan)
+    return futures
+
+def format_calendar_text(cal_evts):
+    """체크인/Daily Five 프롬프트용 캘린더 요약"""
+    return "\n".join(f"[{CALENDAR_LABELS.get(name, name)}]{e['time']} {e['title']}" for name, events in cal_evts.items() for e in events) or "None"
+
+# ==========================================
+# [05:00 사전 생성] 미션 날짜가 바뀌는 시각에 하루치 산출물을 미리 만들어 파일 캐시에 저장
+# - 시트/캘린더 프리페치 → 아침 기록이 들어오면 추세 + 체크인 + Daily Five 생성
+# - 아침 기록(Health_Log)이 아직 없으면 PRECOMPUTE_RETRY 간격으로 재시도
+# - 체크인/Daily Five 생성이 실패하면 PRECOMPUTE_RETRY부터 2배씩 (최대 PRECOMPUTE_RETRY_MAX) 재시도
+# - 대시보드 첫 렌더는 파일 캐시 읽기만 하게 된다 (생성 중이면 single_flight로 그 결과를 기다림)
+# ==========================================
+PRECOMPUTE_HOUR = 5            # get_mission_date_key()의 날짜 전환 시각
+PRECOMPUTE_RETRY = 600         # 초
+PRECOMPUTE_RETRY_MAX = 3600    # 초: 생성 실패 재시도 간격 상한
+PRECOMPUTE_UNTIL_HOUR = 12     # 이 시각까지 아침 기록이 없으면 그날은 대시보드의 지연 생성에 맡김
+
+def run_daily_precompute(date_key):
+    """date_key의 추세/체크인/Daily Five를 미리 생성. 단계별 결과 dict 반환"""
+    result = {"date_key": date_key, "trend": False, "checkin": False, "daily_five": False, "waiting_for": None}
+    bulk_load_sheets(force=True)
+    get_calendar_cache().refresh(timeout=60)
+    cal_evts = get_today_calendar_events()
+
+    data_ctx = DataContext()
+    df_h = data_ctx.health
+    today_h = df_h[df_h['Date_Clean'] == date_key] if 'Date_Clean' in df_h.columns else df_h.iloc[0:0]
+    if today_h.empty:
+        # 추세는 그날 아침 체중까지 넣어서 1번만 고정되므로 아침 기록 전에는 계산하지 않는다
+        result["waiting_for"] = "Health_Log"
+        return result
+
+    result["trend"] = get_or_create_daily_trend(date_key, data_ctx) is not None
+    m_row = today_h.iloc[0]
+    status = {'weight': float(m_row['Weight']), 'hrv': float(m_row['HRV']), 'rhr': float(m_row['RHR'])}
+    m_ctx = prepare_full_context(data_ctx, status['weight'], True)
+    cal_txt = format_calendar_text(cal_evts)
+
+    ck_res = get_or_create_checkin(date_key, status['hrv'], status['rhr'], status['weight'], m_ctx, cal_txt)
+    result["checkin"] = bool(ck_res) and not ck_res.get("error")
+    if not result["checkin"]:
+        result["waiting_for"] = "checkin"
+    sprint = get_active_sprint()
+    if sprint:
+        five_ctx = {'calendar': cal_txt, 'training_facts': format_training_facts(get_training_stats(data_ctx, date_key, include_today=False))}
+        result["daily_five"] = get_or_create_daily_five(date_key, sprint, status, five_ctx) is not None
+        if not result["daily_five"] and result["waiting_for"] is None:
+            result["waiting_for"] = "daily_five"
+    return result
+
+def seconds_until_next_precompute(now_kst):
+    target = now_kst.replace(hour=PRECOMPUTE_HOUR, minute=0, second=0, microsecond=0)
+    if target <= now_kst:
+        target += timedelta(days=1)
+    return (target - now_kst).total_seconds()
+
+@st.cache_resource
+def get_precompute_scheduler():
+    """프로세스당 1개의 사전 생성 스레드. 재시작이 05:00 이후여도 그날 산출물이 없으면 바로 실행"""
+    state = {"wake": threading.Event(), "force": False, "runs": 0, "last_result": None, "last_error": None, "last_run_at": None, "next_run_at": None, "failures": 0}
+
+    def _loop():
+        while True:
+            now_kst = get_current_kst()
+            date_key = get_mission_date_key()
+            last = state["last_result"]
+            if last is not None and last["date_key"] != date_key:
+                state["failures"] = 0
+            done = last is not None and last["date_key"] == date_key and last["waiting_for"] is None
+            in_window = PRECOMPUTE_HOUR <= now_kst.hour < PRECOMPUTE_UNTIL_HOUR
+
+            wait = min(seconds_until_next_precompute(now_kst), 3600)  # 시계 보정 대비 최대 1시간 단위로 재확인
+            if state["force"] or (in_window and not done):
+                state["force"] = False
+                try:
+                    state["last_result"] = run_daily_precompute(date_key)
+                    state["last_error"] = None
+                except Exception as e:
+                    state["last_error"] = str(e)
+                    print(f"⚠️ Daily precompute error ({date_key}): {e}")
+                state["runs"] += 1
+                state["last_run_at"] = time.time()
+                waiting_for = None if state["last_error"] else state["last_result"]["waiting_for"]
+                if state["last_error"] or waiting_for in ("checkin", "daily_five"):
+                    state["failures"] += 1
+                    wait = min(PRECOMPUTE_RETRY_MAX, PRECOMPUTE_RETRY * 2 ** (state["failures"] - 1))
+                else:
+                    state["failures"] = 0
+                    if waiting_for:
+                        wait = PRECOMPUTE_RETRY
+            state["next_run_at"] = time.time() + wait
+            state["wake"].wait(timeout=wait)
+            state["wake"].clear()
+
+    threading.Thread(target=_loop, name="daily-precompute", daemon=True).start()
+    return state
 
 # ==========================================
 # [메인 UI]
 # ==========================================
-tab1, tab2, tab3, tab4 = st.tabs(["📊 대시보드", "🎯 Sprint", "📝 기록하기", "🏎️ Pit Wall"])
 
 # [TAB 1] Dashboard
-with tab1:
+def render_dashboard_tab(data_ctx):
     st.markdown("### 📡 Real-time Bio-Stat")
+    if sheets_recently_failed():
+        st.warning("⚠️ Google Sheets 쿼터 초과/오류로 일부 데이터가 최신이 아닐 수 있습니다. (자동 재시도 중)")
     try:
-        sh_h = get_db_connection("Health_Log")
-        sh_a = get_db_connection("Action_Log")
-        df_h = pd.DataFrame(sh_h.get_all_records())
-        df_a = pd.DataFrame(sh_a.get_all_records())
+        df_h = data_ctx.health
+        df_a = data_ctx.action
         
         if not df_h.empty:
             now_kst = get_current_kst()
             date_key = get_mission_date_key()
 
-            # ✅ [추가] 오늘 추세(EWMA) 1회 고정 생성
-            trend = get_or_create_daily_trend(date_key,df_h)
-
-            cal_evts = get_today_calendar_events()
-            
             today_logs = df_a[df_a['Date'] == date_key]
             today_acts = [f"[{r['Action_Time']}] {r['Category']}: {r['User_Input']}" for _, r in today_logs.iterrows()]
             
             last_h = df_h.iloc[-1]
             hrv_c, rhr_c, w_c = float(last_h.get('HRV',0)), float(last_h.get('RHR',0)), float(last_h.get('Weight',0))
-            mission = calculate_mission_status(w_c)
             
-            st.caption(f"🕒 마지막 업데이트: {last_h.get('Date','Unknown')}")
+            refreshing = " · 🔄 갱신 중" if get_refresh_state()["running"] else ""
+            st.caption(f"🕒 데이터 스냅샷: {format_age(get_snapshot_age('Health_Log'))} (최근 기록 {last_h.get('Date','Unknown')}){refreshing}")
 
             hrv_icon = "🟢" if hrv_c >= 45 else "🔴"
             rhr_icon = "🟢" if rhr_c <= 65 else "🔴"
@@ -1090,76 +3511,86 @@ with tab1:
             st.markdown(f"""<div style="display: flex; align-items: baseline; gap: 8px; margin-bottom: 10px;"><h3 style="margin: 0;">☀️ Daily Check-in</h3>
             <span style="font-size: 11px; color: #94a3b8;">({checkin_lbl})</span>
             </div>""", unsafe_allow_html=True)
+            checkin_slot = st.empty()
 
-            df_h['Date_Clean'] = pd.to_datetime(df_h['Date'], errors='coerce').dt.strftime('%Y-%m-%d')
+            st.write("")
+            plan_header_slot = st.empty()
+            plan_slot = st.empty()
+
+            # 로컬 컨텍스트 계산 (LLM 호출 전)
             today_h = df_h[df_h['Date_Clean'] == date_key]
-            
-            if not today_h.empty:
-                m_row = today_h.iloc[0]
-                m_ctx = prepare_full_context(df_h, df_a, float(m_row['Weight']), True)
-                cal_txt = "\n".join([f"[운동]{e['time']} {e['title']}" for e in cal_evts['Sports']] + [f"[일정]{e['time']} {e['title']}" for e in cal_evts['Termin']]) or "None"
-                
-                ck_res = load_checkin_cache(date_key)
-                if not ck_res:
-                    with st.spinner("Analyzing..."):
-                        ck_res = ai_generate_daily_checkin(date_key, float(m_row['HRV']), float(m_row['RHR']), float(m_row['Weight']), m_ctx, cal_txt)
+            m_row = today_h.iloc[0] if not today_h.empty else None
+            m_ctx = prepare_full_context(data_ctx, float(m_row['Weight']), True) if m_row is not None else None
+            rt_ctx = prepare_full_context(data_ctx, w_c, False)
 
-                        ck_res["generated_at_kst"] = get_current_kst().strftime("%Y-%m-%d %H:%M:%S")
-                        ck_res["date_key"] = date_key  # 기준일도 명시적으로 남김
+            cal_evts = get_today_calendar_events()
+            cal_txt = format_calendar_text(cal_evts)
+
+            def render_plan_partial(fields):
+                # 스트리밍 중: 도착한 텍스트를 바로 표시 (최종 결과는 아래에서 덮어씀)
+                plan_header_slot.markdown("""<h3 style="margin-bottom: 10px;">⚡ Action Plan <span class="time-badge">생성 중</span></h3>""", unsafe_allow_html=True)
+                plan_slot.markdown(
+                    f"**📊 현재 상황:** {fields.get('current_analysis', '')}\n\n"
+                    f"**🚀 실질적 조언:**\n{fields.get('next_actions', '').replace(chr(10), chr(10)*2)}▌"
+                )
 
-                        save_checkin_cache(date_key, ck_res)
-                        clear_old_caches()
-                
-                try:
-                    sprint = get_active_sprint()
-                    if sprint:
-                        if not load_dailyfive_cache(date_key, sprint['sprint_id']):
-                            five = ai_generate_daily_five(
-                                date_key,
-                                sprint,
-                                {'weight': float(m_row['Weight']), 'hrv': float(m_row['HRV']), 'rhr': float(m_row['RHR'])},
-                                {'calendar': cal_txt}
-                            )
-                            if five:
-                                save_dailyfive_cache(date_key, sprint['sprint_id'], five)
-                except:
-                    pass
-
-                icon = {"Green":"🟢", "Red":"🔴"}.get(ck_res.get('condition_signal'), "🟡")
-                st.subheader(f"{icon} {ck_res.get('condition_title', 'Analyzing...')}")
-                with st.container(border=True): st.markdown(f"**🕵️ 분석:** {ck_res.get('analysis')}")
-                
-                st.write(""); st.markdown("**🎯 오늘의 전략**")
-                
-                c1, c2, c3 = st.columns(3)
-                with c1: st.markdown(f"""<div class="strategy-box workout-box"><span class="strategy-title">💪 운동</span>{ck_res.get('mission_workout')}</div>""", unsafe_allow_html=True)
-                with c2: st.markdown(f"""<div class="strategy-box diet-box"><span class="strategy-title">🥗 식단</span>{ck_res.get('mission_diet')}</div>""", unsafe_allow_html=True)
-                with c3: st.markdown(f"""<div class="strategy-box recovery-box"><span class="strategy-title">🔋 회복</span>{ck_res.get('mission_recovery')}</div>""", unsafe_allow_html=True)
-            else: st.info(f"💤 데이터 대기 중 ({date_key})")
-            
-            st.write("")
-            rt_ctx = prepare_full_context(df_h, df_a, w_c, False)
-            ap = ai_generate_action_plan(hrv_c, rhr_c, w_c, rt_ctx, today_acts + [f"[CALENDAR] {cal_evts}"])
-            
-            st.markdown(f"""<h3 style="margin-bottom: 10px;">⚡ Action Plan <span class="time-badge">{ap.get('generated_at', now_kst.strftime('%H:%M'))} 기준</span></h3>""", unsafe_allow_html=True)
+            # 체크인 / Daily Five / Action Plan 동시 생성 → 끝나는 순서대로 각 섹션 렌더
+            futures = start_dashboard_generations(
+                data_ctx, date_key, m_row, m_ctx, cal_txt,
+                (hrv_c, rhr_c, w_c, rt_ctx, today_acts + [f"[CALENDAR] {cal_txt}"], format_training_facts(get_training_stats(data_ctx, date_key))),
+                build_plan_fingerprint(data_ctx, cal_evts, now_kst),
+                on_plan_partial=render_plan_partial
+            )
 
-            with st.container(border=True):
-                st.markdown(f"**📊 현재 상황:** {ap.get('current_analysis')}")
-                st.markdown(f"**🚀 실질적 조언:**\n{ap.get('next_actions', '').replace(chr(10), chr(10)*2)}")
-                if ap.get('warnings'): st.error(f"⚠️ {ap['warnings']}")
+            if m_row is None:
+                checkin_slot.info(f"💤 데이터 대기 중 ({date_key})")
+            else:
+                checkin_slot.caption("☀️ Analyzing...")
+            plan_slot.caption("⚡ Action Plan 생성 중...")
+
+            for fut in as_completed(list(futures.values())):
+                name = next(k for k, v in futures.items() if v is fut)
+                try:
+                    result = fut.result()
+                except Exception as e:
+                    print(f"⚠️ Dashboard generation error ({name}): {e}")
+                    result = None
+
+                if name == "checkin":
+                    ck_res = result or {"condition_signal": "Yellow", "condition_title": "Error", "analysis": "-",
+                                        "mission_workout": "-", "mission_diet": "-", "mission_recovery": "-"}
+                    with checkin_slot.container():
+                        icon = {"Green":"🟢", "Red":"🔴"}.get(ck_res.get('condition_signal'), "🟡")
+                        st.subheader(f"{icon} {ck_res.get('condition_title', 'Analyzing...')}")
+                        with st.container(border=True): st.markdown(f"**🕵️ 분석:** {ck_res.get('analysis')}")
+                        
+                        st.write(""); st.markdown("**🎯 오늘의 전략**")
+                        
+                        c1, c2, c3 = st.columns(3)
+                        with c1: st.markdown(f"""<div class="strategy-box workout-box"><span class="strategy-title">💪 운동</span>{ck_res.get('mission_workout')}</div>""", unsafe_allow_html=True)
+                        with c2: st.markdown(f"""<div class="strategy-box diet-box"><span class="strategy-title">🥗 식단</span>{ck_res.get('mission_diet')}</div>""", unsafe_allow_html=True)
+                        with c3: st.markdown(f"""<div class="strategy-box recovery-box"><span class="strategy-title">🔋 회복</span>{ck_res.get('mission_recovery')}</div>""", unsafe_allow_html=True)
+
+                elif name == "plan":
+                    ap = result or {"current_analysis": "분석 중...", "next_actions": "데이터 대기 중...", "warnings": ""}
+                    plan_header_slot.markdown(f"""<h3 style="margin-bottom: 10px;">⚡ Action Plan <span class="time-badge">{ap.get('generated_at', now_kst.strftime('%H:%M'))} 기준</span></h3>""", unsafe_allow_html=True)
+
+                    with plan_slot.container(border=True):
+                        st.markdown(f"**📊 현재 상황:** {ap.get('current_analysis')}")
+                        st.markdown(f"**🚀 실질적 조언:**\n{ap.get('next_actions', '').replace(chr(10), chr(10)*2)}")
+                        if ap.get('warnings'): st.error(f"⚠️ {ap['warnings']}")
+                        if ap.get('regen_reasons'): st.caption(f"🔁 갱신 이유: {', '.join(ap['regen_reasons'])}")
         else: st.warning("No Data")
     except Exception as e: st.error(f"Error: {e}")
 
 # =========================================================
 # [TAB 2] 🎯 Sprint
 # =========================================================
-with tab2:
+def render_sprint_tab(data_ctx):
     with st.spinner("로딩 중..."):
         try:
-            @st.cache_data(ttl=300)
             def get_current_health_data():
-                sh_h = get_db_connection("Health_Log")
-                df_h = pd.DataFrame(sh_h.get_all_records())
+                df_h = data_ctx.health
                 if df_h.empty:
                     return None
                 last = df_h.iloc[-1]
@@ -1188,12 +3619,8 @@ with tab2:
                     # ✅ Tab2: 오늘 키(05:00 기준) 먼저 만든다
                     date_key = get_mission_date_key()
 
-                    # ✅ Health_Log 로딩 (이미 위에서 health_data 받았지만, trend 계산엔 df_h가 필요)
-                    sh_h = get_db_connection("Health_Log")
-                    df_h = pd.DataFrame(sh_h.get_all_records())
-
-                    # ✅ trend는 "오늘 1회 고정" 캐시 함수로 가져온다 (없으면 계산해서 저장)
-                    trend = get_or_create_daily_trend(date_key, df_h)
+                    # ✅ trend는 "오늘 1회 고정" 캐시 함수로 가져온다 (없으면 data_ctx의 Health_Log로 계산해서 저장)
+                    trend = get_or_create_daily_trend(date_key, data_ctx)
                     trend_weight = trend["trend_weight"] if trend else None
 
                     # ✅ sprint progress는 trend_weight 기반으로 다시 계산
@@ -1250,29 +3677,20 @@ with tab2:
                     
                     st.divider()
                     
-                    now_kst = get_current_kst()
                     trend = load_trend_cache(date_key)
 
                     st.markdown("### ✅ 오늘의 데일리 파이브")
                     st.caption(f"🕐 {date_key} 05:00 생성")
                     
                     cal_events = get_today_calendar_events()
-                    cal_text = "\n".join([f"[운동]{e['time']} {e['title']}" for e in cal_events['Sports']] + 
-                                         [f"[일정]{e['time']} {e['title']}" for e in cal_events['Termin']]) or "None"
+                    cal_text = format_calendar_text(cal_events)
                     
-                    cached_five = load_dailyfive_cache(date_key, sprint['sprint_id'])
-                    if not cached_five:
-                        daily_five = ai_generate_daily_five(
-                            date_key, 
-                            sprint,
-                            {'weight': current_weight, 'hrv': current_hrv, 'rhr': current_rhr},
-                            {'calendar': cal_text}
-                        )
-                        if daily_five:
-                            save_dailyfive_cache(today_key, sprint['sprint_id'], daily_five)
-                            clear_old_caches()  # 기존 함수 재사용
-                    else:
-                        daily_five = cached_five
+                    daily_five = get_or_create_daily_five(
+                        date_key,
+                        sprint,
+                        {'weight': current_weight, 'hrv': current_hrv, 'rhr': current_rhr},
+                        {'calendar': cal_text, 'training_facts': format_training_facts(get_training_stats(data_ctx, date_key, include_today=False))}
+                    )
                     
                     if daily_five and 'tasks' in daily_five:
                         
@@ -1320,11 +3738,12 @@ with tab2:
                     st.markdown("### 📅 앞으로의 계획")
                     st.caption("현재 페이스 유지 시 예상")
                     
-                    with st.expander("내일 예상"):
-                        st.info("내일 아침 5시에 생성됩니다")
-                    
-                    with st.expander("모레 예상"):
-                        st.info("모레 아침 5시에 생성됩니다")
+                    upcoming = get_calendar_events_window(datetime.strptime(date_key, '%Y-%m-%d').date() + timedelta(days=1), 2)
+                    for (day, day_evts), label in zip(upcoming.items(), ["내일", "모레"]):
+                        with st.expander(f"{label} 예상 ({day.strftime('%m/%d')})"):
+                            st.info(f"{label} 아침 5시에 생성됩니다")
+                            day_cal = format_calendar_text(day_evts)
+                            st.caption("📅 일정: " + (day_cal.replace("\n", " · ") if day_cal != "None" else "없음"))
                     
         except Exception as e:
             st.error(f"Error: {e}")
@@ -1334,7 +3753,46 @@ with tab2:
 # =========================================================
 # [TAB 3] 기록하기 (드롭다운 유지 / 시-분 분리 / 아카이브 지연 로딩)
 # =========================================================
-with tab3:
+LOG_CATEGORIES = ["섭취", "운동", "음주", "영양제", "회복", "노트"]
+BULK_LOG_LINE = re.compile(r"^\s*(\d{1,2})[:시]\s*(\d{1,2})?분?[\s,|\t]+(\S+?)[\s,|:\t]+(.+?)\s*$")
+
+def parse_bulk_log_lines(text):
+    """
+    여러 줄 입력 → ([(HH:MM, 카테고리, 내용)], [오류 메시지])
+    한 줄 형식: "07:30 섭취 닭가슴살 샐러드" (구분자는 공백/쉼표/탭, 시각은 7:30, 7시 30분도 허용)
+    """
+    entries, errors = [], []
+    for n, line in enumerate(str(text).splitlines(), start=1):
+        if not line.strip():
+            continue
+        m = BULK_LOG_LINE.match(line)
+        if not m:
+            errors.append(f"{n}번째 줄 형식 오류: {line.strip()}")
+            continue
+        hour, minute, category, content = int(m.group(1)), int(m.group(2) or 0), m.group(3), m.group(4)
+        if category not in LOG_CATEGORIES:
+            errors.append(f"{n}번째 줄 카테고리 오류 ({category}): {' / '.join(LOG_CATEGORIES)} 중 하나")
+        elif hour > 23 or minute > 59:
+            errors.append(f"{n}번째 줄 시각 오류: {m.group(1)}:{m.group(2)}")
+        else:
+            entries.append((f"{hour:02d}:{minute:02d}", category, content))
+    return entries, errors
+
+def build_log_rows(log_date, entries):
+    """(시각, 카테고리, 내용) → Action_Log 행 + 행별 파싱 대기 여부. 규칙으로 되는 행은 분석까지 채움"""
+    ai_col = get_action_column_index(AI_JSON_COLUMN, 5)
+    rows, pending = [], []
+    for log_time, category, text in entries:
+        row = [log_date.strftime("%Y-%m-%d"), log_time, category, text, "", ""]
+        parsed = fast_parse_log(category, text)
+        if parsed:
+            row = row + [""] * max(0, ai_col - len(row))
+            row[ai_col - 1] = json.dumps(parsed, ensure_ascii=False)
+        rows.append(row)
+        pending.append(parsed is None)
+    return rows, pending
+
+def render_log_tab(data_ctx):
     now_kst = get_current_kst()
     today_str = now_kst.strftime('%Y-%m-%d')
 
@@ -1343,22 +3801,26 @@ with tab3:
     # -----------------------------
     st.markdown("### 📊 오늘의 기록")
 
-    @st.cache_data(ttl=300)
     def get_today_summary(date_str):
         cal = 0
         mins = 0
+        pending = 0
         try:
-            sh_a = get_db_connection("Action_Log")
-            df_a = pd.DataFrame(sh_a.get_all_records())
+            df_a = data_ctx.action
 
             if not df_a.empty:
-                df_a["Date_Clean"] = pd.to_datetime(df_a["Date"], errors="coerce").dt.strftime("%Y-%m-%d")
                 today_df = df_a[df_a["Date_Clean"] == date_str]
 
                 for _, r in today_df.iterrows():
                     try:
-                        js = json.loads(r.get("AI_Analysis_JSON", "{}") or "{}")
                         cat = str(r.get("Category", ""))
+                        raw = str(r.get("AI_Analysis_JSON", "") or "").strip()
+                        if not raw:
+                            # 아직 AI 파싱 전 → 0kcal로 세지 않고 대기로 집계
+                            if "섭취" in cat or "운동" in cat:
+                                pending += 1
+                            continue
+                        js = json.loads(raw)
                         if "섭취" in cat:
                             cal += int(js.get("calories", 0) or 0)
                         if "운동" in cat:
@@ -1368,15 +3830,23 @@ with tab3:
         except:
             pass
 
-        return {"calories": cal, "minutes": mins}
+        return {"calories": cal, "minutes": mins, "pending": pending}
 
     summary = get_today_summary(today_str)
 
+    pending_today = data_ctx.action[data_ctx.action["_pending"]] if "_pending" in data_ctx.action.columns else pd.DataFrame()
+    if not pending_today.empty:
+        with st.container(border=True):
+            st.caption(f"⏳ 시트 전송 대기 {len(pending_today)}건 (로컬에 안전하게 저장됨)")
+            for _, r in pending_today.iterrows():
+                st.markdown(f"• [{r.get('Date', '')} {r.get('Action_Time', '')}] {r.get('Category', '')}: {r.get('User_Input', '')}")
+
     summary_html = f"""
     <div style="display:flex; gap:8px; margin-bottom:16px; flex-wrap:wrap;">
       <div style="flex:1; min-width:140px; background:#FFFFFF; padding:14px 8px; border-radius:12px; border:1px solid #E2E8F0; text-align:center; box-shadow:0 1px 2px rgba(0,0,0,0.05);">
         <div style="font-size:12px; color:#64748B; font-weight:600; margin-bottom:6px;">섭취 칼로리</div>
         <div style="font-size:22px; font-weight:900; color:#1A2B4D;">{summary['calories']} kcal</div>
+        {f'<div style="font-size:11px; color:#F59E0B; margin-top:4px;">⏳ 분석 대기 {summary["pending"]}건</div>' if summary['pending'] else ''}
       </div>
 
       <div style="flex:1; min-width:140px; background:#FFFFFF; padding:14px 8px; border-radius:12px; border:1px solid #E2E8F0; text-align:center; box-shadow:0 1px 2px rgba(0,0,0,0.05);">
@@ -1405,7 +3875,7 @@ with tab3:
     default_hour = now_kst.hour
     default_minute = (now_kst.minute // 5) * 5
 
-    categories = ["섭취", "운동", "음주", "영양제", "회복", "노트"]
+    categories = LOG_CATEGORIES
 
     with st.container(border=True):
         with st.form("log_form", clear_on_submit=True):
@@ -1466,18 +3936,42 @@ with tab3:
                 st.error("⚠️ 내용을 입력해주세요.")
             else:
                 try:
-                    with st.spinner("저장 중..."):
-                        parsed = ai_parse_log(log_category, text_clean, log_time)
-                        get_db_connection("Action_Log").append_row([
-                            log_date.strftime("%Y-%m-%d"),
-                            log_time,
-                            log_category,
-                            text_clean,
-                            json.dumps(parsed, ensure_ascii=False),
-                            ""
-                        ])
-                    st.success("✅ 저장 완료!")
-                    st.cache_data.clear()
+                    # 로컬 저널에 원본만 먼저 기록 (AI_Analysis_JSON은 비움)
+                    # → 시트 전송은 flusher, AI 파싱/셀 채우기는 파싱 워커가 백그라운드에서 담당
+                    # 규칙으로 바로 파싱되는 입력(영양제/음주/회복/아는 음식)은 분석까지 채워서 기록
+                    rows, pending = build_log_rows(log_date, [(log_time, log_category, text_clean)])
+                    journal_append(rows, parse_pending=pending)
+                    st.success("✅ 저장 완료! (AI 분석은 잠시 후 반영)" if pending[0] else "✅ 저장 완료!")
+                    invalidate_tags("Action_Log")
+                    st.rerun()
+                except Exception as e:
+                    st.error(f"저장 실패: {e}")
+
+    # 여러 건 한번에 기록: 저널 1회 기록 → append_rows 1회, 파싱은 워커가 LLM 1회로 묶어서
+    with st.expander("📋 여러 건 한번에 기록 (하루치 몰아서)", expanded=False):
+        with st.form("bulk_log_form", clear_on_submit=False):
+            bulk_date = st.date_input("날짜", value=default_date, key="bulk_log_date_widget")
+            bulk_text = st.text_area(
+                "한 줄에 한 건: 시각 카테고리 내용",
+                placeholder="07:30 영양제 마그네슘, 오메가3\n08:00 섭취 닭가슴살 샐러드\n12:30 섭취 김치찌개, 공기밥\n19:30 운동 러닝 5km\n22:00 회복 사우나 2세트",
+                height=180,
+                key="bulk_log_text_widget",
+            )
+            bulk_submitted = st.form_submit_button("🚀 모두 저장", use_container_width=True)
+
+        if bulk_submitted:
+            entries, errors = parse_bulk_log_lines(bulk_text)
+            if errors:
+                st.error("⚠️ 아래 줄을 고쳐주세요. (아무것도 저장하지 않았습니다)\n\n" + "\n".join(f"- {e}" for e in errors))
+            elif not entries:
+                st.error("⚠️ 내용을 입력해주세요.")
+            else:
+                try:
+                    rows, pending = build_log_rows(bulk_date, entries)
+                    journal_append(rows, parse_pending=pending)
+                    st.success(f"✅ {len(rows)}건 저장 완료! (즉시 분석 {len(rows) - sum(pending)}건, AI 분석 대기 {sum(pending)}건)")
+                    st.session_state.pop("bulk_log_text_widget", None)  # 성공했을 때만 입력칸 비우기 (오류 시엔 고쳐서 다시 제출)
+                    invalidate_tags("Action_Log")
                     st.rerun()
                 except Exception as e:
                     st.error(f"저장 실패: {e}")
@@ -1489,13 +3983,8 @@ with tab3:
     # -----------------------------
     with st.expander("📂 아카이브 (펼치면 로딩)", expanded=False):
 
-        @st.cache_data(ttl=300)
-        def load_archive_data():
-            sh_a = get_db_connection("Action_Log")
-            return pd.DataFrame(sh_a.get_all_records())
-
         try:
-            df = load_archive_data()
+            df = data_ctx.action
             if df.empty:
                 st.info("아직 기록이 없습니다.")
             else:
@@ -1514,15 +4003,160 @@ with tab3:
 # =========================================================
 # [TAB 4] Pit Wall
 # =========================================================
-with tab4:
+def render_pit_wall_tab(data_ctx):
     st.markdown("## 🏎️ The Pit Wall")
     st.info("개발자 도구 영역")
     
     st.write("server now:", datetime.now())
     st.write("kst now:", get_current_kst())
-    st.write("sprint start:", sprint['start_date'])
+    sprint = get_active_sprint()
+    st.write("sprint start:", sprint['start_date'] if sprint else None)
+
+    st.markdown("#### 📦 DataContext (이번 실행)")
+    st.caption("워크시트별 로딩 횟수는 실행당 최대 1회여야 합니다.")
+    st.dataframe(data_ctx.stats(), use_container_width=True, hide_index=True)
+    ctx_memo = get_context_memo()
+    st.caption(f"컨텍스트 로그 예산 {CONTEXT_TOKEN_BUDGET}토큰 ({'tiktoken' if get_token_encoder() else '추정'}), 날짜별 섹션 메모 적중 {ctx_memo['hits']} / 생성 {ctx_memo['misses']}")
+
+    st.markdown("#### 📮 Action_Log 저널")
+    flusher = get_journal_flusher()
+    st.write({"전송 완료": flusher["flushed"], "전송 실패": flusher["failures"], "마지막 오류": flusher["last_error"]})
+    parser = get_parse_worker()
+    st.write({"AI 파싱 완료": parser["parsed"], "파싱 실패": parser["failed"], "진행 중": len(parser["inflight"]), "셀 백필": parser["cells_synced"]})
+    fast = get_fast_parse_stats()
+    st.write({"규칙 파싱": fast["rule"], "LLM으로 넘김": fast["llm"]})
+    food_index = get_food_index()
+    sources = pd.Series([e["source"] for e in list(food_index["entries"].values())]).value_counts().to_dict()
+    st.caption(f"🍱 음식 인덱스: {len(food_index['entries'])}개 ({sources}), 로컬 매칭 {food_index['matched']}회, 학습 {food_index['learned']}건")
+    if st.button("🍱 음식 인덱스 재구축 (미러의 과거 섭취 기록 반영)"):
+        n = load_food_index(food_index)
+        st.success(f"음식 인덱스 {n}개 항목 로딩 완료!")
+
+    st.markdown("#### 🌅 05:00 사전 생성")
+    pre = get_precompute_scheduler()
+    st.write({
+        "실행 횟수": pre["runs"],
+        "마지막 실행": datetime.fromtimestamp(pre["last_run_at"], KST).strftime('%H:%M:%S') if pre["last_run_at"] else None,
+        "마지막 결과": pre["last_result"],
+        "마지막 오류": pre["last_error"],
+        "다음 확인": datetime.fromtimestamp(pre["next_run_at"], KST).strftime('%m-%d %H:%M') if pre["next_run_at"] else None,
+    })
+    if st.button("🌅 지금 사전 생성 실행"):
+        pre["force"] = True
+        pre["wake"].set()
+        st.success("사전 생성 작업을 깨웠습니다. 잠시 후 새로고침하세요.")
+
+    st.markdown("#### 📅 캘린더 캐시")
+    cal_cache = get_calendar_cache()
+    cal_stats = cal_cache.stats
+    st.write({
+        "동기화": cal_stats["syncs"], "배치 요청": cal_stats["batches"], "전체/증분": f"{cal_stats['full_syncs']}/{cal_stats['incremental_syncs']}",
+        "410 재동기화": cal_stats["resyncs_410"], "변경 수신": cal_stats["changes"], "오류": cal_stats["errors"],
+        "저장 이벤트": {name: len(store["events"]) for name, store in list(cal_cache.stores.items())},
+        "마지막 동기화": datetime.fromtimestamp(cal_stats["last_sync_at"], KST).strftime('%H:%M:%S') if cal_stats["last_sync_at"] else None,
+        "소요(ms)": round(cal_stats["last_sync_ms"]),
+    })
+    if cal_stats["last_error"]:
+        st.caption(f"마지막 오류: {cal_stats['last_error']}")
+    if st.button("📅 캘린더 지금 동기화"):
+        if cal_cache.refresh(timeout=30):
+            st.success("캘린더 동기화 완료!")
+        else:
+            st.warning("30초 안에 동기화가 끝나지 않았습니다. 백그라운드에서 계속 진행 중이니 잠시 후 새로고침하세요.")
+
+    st.markdown("#### 🏋️ 훈련 통계 (프롬프트 주입값)")
+    st.code(format_training_facts(get_training_stats(data_ctx, get_mission_date_key())), language=None)
+
+    st.markdown("#### ⚡ Action Plan 재생성 기록 (오늘)")
+    plan_history = load_plan_history(get_mission_date_key())
+    if plan_history:
+        st.dataframe(pd.DataFrame([{"시각": t, "이유": ", ".join(r)} for t, r in plan_history]), use_container_width=True, hide_index=True)
+    else:
+        st.caption("오늘 생성된 플랜 없음")
+
+    st.markdown("#### 🚦 Sheets 스케줄러")
+    sched_stats = get_sheets_scheduler().stats
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("요청", sched_stats["requests"])
+    k2.metric("쓰로틀(대기/429)", f"{sched_stats['throttled']}/{sched_stats['rate_limited']}")
+    k3.metric("재시도", sched_stats["retries"])
+    k4.metric("병합된 읽기", sched_stats["coalesced"])
+    if sched_stats["last_error"]:
+        st.caption(f"마지막 오류 ({datetime.fromtimestamp(sched_stats['last_error_at'], KST).strftime('%H:%M:%S')}): {sched_stats['last_error']}")
+
+    st.markdown("#### 🛰️ LLM 게이트웨이")
+    gateway = get_llm_gateway()
+    g = gateway.stats
+    g1, g2, g3, g4 = st.columns(4)
+    g1.metric("호출 (재시도 포함)", g["calls"])
+    g2.metric("실패/재시도", f"{g['failures']}/{g['retries']}")
+    g3.metric("차단/폴백", f"{g['fast_fails']}/{g['fallbacks']}")
+    g4.metric("토큰 (입력+출력)", f"{g['prompt_tokens']:,}+{g['completion_tokens']:,}")
+    cached_ratio = g["cached_tokens"] / g["prompt_tokens"] if g["prompt_tokens"] else 0
+    st.caption(f"제공자 프롬프트 캐시: 입력 토큰 중 {g['cached_tokens']:,} ({cached_ratio:.0%}) 캐시 적중")
+    open_models = [m for m in list(gateway.breakers) if gateway.breaker_open(m)]
+    if open_models:
+        st.warning(f"서킷 차단 중: {', '.join(open_models)}")
+    if g["last_error"]:
+        st.caption(f"마지막 오류 ({datetime.fromtimestamp(g['last_error_at'], KST).strftime('%H:%M:%S')}): {g['last_error']}")
+    if gateway.calls:
+        st.dataframe(pd.DataFrame(list(gateway.calls)[::-1]), use_container_width=True, hide_index=True)
+
+    st.markdown("#### 🧠 LLM 응답 캐시")
+    llm_stats = get_llm_cache_stats()
+    llm_disk = llm_cache_summary()
+    lookups = llm_stats["hits"] + llm_stats["misses"]
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("적중률 (이번 프로세스)", f"{llm_stats['hits'] / lookups:.0%}" if lookups else "-", f"{llm_stats['hits']}/{lookups}", delta_color="off")
+    c2.metric("아낀 토큰 (이번 프로세스)", f"{llm_stats['saved_tokens']:,}")
+    c3.metric("과금 토큰 (이번 프로세스)", f"{llm_stats['billed_tokens']:,}")
+    c4.metric("누적 아낀 토큰 (추정)", f"{llm_disk['saved_tokens']:,}")
+    st.caption(f"디스크 캐시: {llm_disk['entries']}개 항목, {llm_disk['size_bytes'] / 1024:.0f} KB / {LLM_CACHE_MAX_BYTES / 1024 / 1024:.0f} MB, 누적 적중 {llm_disk['hits']}회, 제거 {llm_stats['evicted']}건")
+    flight = get_single_flight_state()
+    st.write({"생성 단독 실행": flight["led"], "대기 후 결과 공유": flight["joined"], "대기 시간 초과": flight["timeouts"]})
+    if st.button("🧹 LLM 캐시 비우기"):
+        clear_llm_cache()
+        st.success("LLM 응답 캐시 삭제 완료!")
 
     if st.button("🔄 전체 캐시 클리어"):
+        # st.cache_resource.clear()는 저널 flusher/파싱/사전 생성/캘린더 스레드를 하나씩 더 띄우므로
+        # 데이터 캐시만 비우고 워커/스케줄러 싱글턴은 유지
         st.cache_data.clear()
-        st.cache_resource.clear()
-        st.success("캐시 클리어 완료!")
\ No newline at end of file
+        get_sheet_snapshots()["data"].clear()
+        get_mirror_state()["frames"].clear()
+        for cached in (get_context_memo, get_training_stats_memo, get_worksheet_handles, get_db_connection):
+            cached.clear()
+        st.success("캐시 클리어 완료!")
+
+    if st.button("🔁 설정 시트 새로고침 (Missions/Sprints)"):
+        # swr 모드에서는 만료 처리만으로는 이전 스냅샷이 그대로 쓰이므로 여기서 기다려서 다시 읽는다
+        # (내용이 바뀐 시트는 store_sheet_snapshot이 태그 버전을 올린다)
+        if bulk_load_sheets(force=True):
+            st.success("설정 시트 새로고침 완료!")
+        else:
+            st.warning("설정 시트를 다시 읽지 못했습니다. 잠시 후 다시 시도하세요.")
+
+    st.caption(f"저장소 백엔드: {get_storage().name}" + (f" ({STORAGE_SQLITE_PATH})" if STORAGE_BACKEND == "sqlite" else ""))
+    if st.button("📥 Sheets → SQLite 복사 (오프라인 백엔드 준비)"):
+        try:
+            n = copy_sheets_to_sqlite()
+            st.success(f"{n}개 워크시트 복사 완료! secrets에 STORAGE_BACKEND = \"sqlite\" 설정 시 사용됩니다.")
+        except Exception as e:
+            st.error(f"복사 실패: {e}")
+
+    if st.button("🗄️ 로컬 미러 재동기화"):
+        reset_mirror()
+        st.success("미러 초기화 완료! 다음 로딩 때 전체 동기화됩니다.")
+
+
+get_journal_flusher()  # 재시작 전에 남은 저널 행도 전송/파싱되도록 백그라운드 워커 먼저 기동
+get_parse_worker()
+get_precompute_scheduler()  # 05:00 KST에 체크인/Daily Five/추세를 미리 만들어 둠
+get_calendar_cache()  # 캘린더 동기화 스레드 기동 (렌더는 메모리 저장소만 읽음)
+prefetch_sheets()  # 콜드 스타트 시 batchGet 1회로 모든 시트 캐시 채우기 (만료만 됐으면 백그라운드 갱신)
+data_ctx = DataContext()
+tab1, tab2, tab3, tab4 = st.tabs(["📊 대시보드", "🎯 Sprint", "📝 기록하기", "🏎️ Pit Wall"])
+with tab1: render_dashboard_tab(data_ctx)
+with tab2: render_sprint_tab(data_ctx)
+with tab3: render_log_tab(data_ctx)
+with tab4: render_pit_wall_tab(data_ctx)
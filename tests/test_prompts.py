@@ -0,0 +1,36 @@
+from datetime import datetime
+
+from prompts import (
+    ACTION_PLAN_SYSTEM_PROMPT, DAILY_FIVE_SYSTEM_PROMPT,
+    build_action_plan_messages, build_daily_five_messages,
+)
+
+SPRINT = {"name": "Sprint A", "duration_days": 28}
+PROGRESS = {"day": 3, "weight_start": 84.0, "weight_target": 80.0, "weight_current": 83.1,
+            "weight_expected": 83.6, "pace_status": "ahead", "weight_delta": -0.5}
+CALL_VALUES = ("41.5", "58.0", "Sprint A", "Sprint B", "2026-03", "Early Morning", "Evening", "[07:30]", "19:00 PT")
+
+
+def test_action_plan_system_prefix_is_byte_identical():
+    a = build_action_plan_messages(41.5, 63.2, 81.3, [], "[STATS] HRV:45.0, RHR:60.1", "Daily Five: None",
+                                   datetime(2026, 3, 2, 7, 10), "[TRAINING FACTS]\n- Workout streak: 0 days")
+    b = build_action_plan_messages(58.0, 55.1, 79.9, ["[07:30] 섭취: 샐러드"], "[LOGS] 2026-03-06 운동: 러닝 5km",
+                                   "Daily Five: 1/5", datetime(2026, 3, 7, 20, 45))
+
+    assert a[0]["role"] == "system"
+    assert a[0]["content"].encode("utf-8") == b[0]["content"].encode("utf-8") == ACTION_PLAN_SYSTEM_PROMPT.encode("utf-8")
+    assert a[1] != b[1]
+    assert not any(v in a[0]["content"] for v in CALL_VALUES)
+
+
+def test_daily_five_system_prefix_is_byte_identical():
+    a = build_daily_five_messages("2026-03-02", SPRINT, PROGRESS, {"hrv": 41.5, "rhr": 63.2, "weight": 83.1},
+                                  {"calendar": "None"})
+    b = build_daily_five_messages("2026-03-07", {**SPRINT, "name": "Sprint B"}, {**PROGRESS, "day": 8, "pace_status": "behind"},
+                                  {"hrv": 58.0, "rhr": 55.1, "weight": 82.4},
+                                  {"calendar": "[운동]19:00 PT", "training_facts": "[TRAINING FACTS]\n- Workout streak: 3 days"})
+
+    assert a[0]["role"] == "system"
+    assert a[0]["content"].encode("utf-8") == b[0]["content"].encode("utf-8") == DAILY_FIVE_SYSTEM_PROMPT.encode("utf-8")
+    assert a[1] != b[1]
+    assert not any(v in a[0]["content"] for v in CALL_VALUES)